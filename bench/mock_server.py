@@ -0,0 +1,245 @@
+import json
+import operator
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from bench.synthetic import SyntheticReport, token_offset
+
+
+QUERYDATA_PATH = "/public/reports/querydata"
+
+# Columns of Where conditions applied by the mock: positions in the Ohio permits report (see default_kinds)
+FILTER_COLUMNS = {"d.Account Number": 0, "t.County": 9, "p1.Submitted Date": 11, "p1.End Date": 13,
+                  "p1.Issue Date": 14}
+
+# PowerBI ComparisonKind values
+COMPARISONS = {0: operator.eq, 1: operator.gt, 2: operator.ge, 3: operator.lt, 4: operator.le}
+
+
+def literal_value(expression: Dict):
+    """Python value of PowerBI literal, datetime as Unix ms (like raw date values)"""
+    text = expression["Literal"]["Value"]
+    if text == "null":
+        return None
+    if text in ("true", "false"):
+        return text == "true"
+    if text.startswith("datetime'"):
+        return int(datetime.fromisoformat(text[9:-1]).replace(tzinfo=timezone.utc).timestamp() * 1000)
+    if text.startswith("'"):
+        return text[1:-1].replace("''", "'")
+    if text.endswith("L"):
+        return int(text[:-1])
+    if text.endswith("D"):
+        return float(text[:-1])
+    raise ValueError(f"Unsupported literal: {text}")
+
+
+def column_name(expression: Dict) -> Optional[str]:
+    """Column expression as "source.Property", None for other expressions"""
+    column = expression.get("Column")
+    if column is None:
+        return None
+    return f"{column['Expression']['SourceRef']['Source']}.{column['Property']}"
+
+
+def compile_condition(condition: Dict, columns: Dict[str, int]) -> Optional[Callable[[List], bool]]:
+    """
+    Row predicate of Where condition (And, Or, Not, Comparison, single-column In)
+    None if condition uses a column not in columns, or an unsupported expression
+    """
+    if "And" in condition or "Or" in condition:
+        both = condition.get("And") or condition["Or"]
+        left = compile_condition(both["Left"], columns)
+        right = compile_condition(both["Right"], columns)
+        if left is None or right is None:
+            return None
+        if "And" in condition:
+            return lambda row: left(row) and right(row)
+        return lambda row: left(row) or right(row)
+    if "Not" in condition:
+        inner = compile_condition(condition["Not"]["Expression"], columns)
+        return None if inner is None else (lambda row: not inner(row))
+    if "Comparison" in condition:
+        comparison = condition["Comparison"]
+        index = columns.get(column_name(comparison["Left"]))
+        if index is None:
+            return None
+        compare = COMPARISONS[comparison["ComparisonKind"]]
+        value = literal_value(comparison["Right"])
+        return lambda row: row[index] is not None and compare(row[index], value)
+    if "In" in condition:
+        expressions = condition["In"]["Expressions"]
+        index = columns.get(column_name(expressions[0])) if len(expressions) == 1 else None
+        if index is None:
+            return None
+        values = {literal_value(value[0]) for value in condition["In"]["Values"]}
+        return lambda row: row[index] in values
+    return None
+
+
+class MockEndpoint:
+    """
+    Local HTTP mock of /public/reports/querydata paginating through a SyntheticReport:
+    - page size is the requested Window.Count, capped at max_window (like the server)
+    - latency: seconds added to each response
+    - error_rate: share of requests answered with 503
+    - throttle_rate: share of requests answered with 429 and Retry-After: retry_after seconds
+    - drop_rate: share of requests whose connection is closed without response
+    - filter_columns: Where conditions on these columns are applied (Account Number ranges and In lists,
+      County In / Not In, sync dates), conditions on other columns (report filters) are ignored
+    Use as context manager, url points to the running server
+    """
+
+    def __init__(self, report: SyntheticReport, host: str = "127.0.0.1", port: int = 0, max_window: int = 30000,
+                 latency: float = 0.0, error_rate: float = 0.0, seed: int = 0, throttle_rate: float = 0.0,
+                 retry_after: float = 1.0, drop_rate: float = 0.0, filter_columns: Optional[Dict[str, int]] = None):
+        self.report = report
+        self.filter_columns = FILTER_COLUMNS if filter_columns is None else filter_columns
+        self.max_window = max_window
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{QUERYDATA_PATH}?synchronous=true"
+
+    def handler(self):
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionError:
+                    # Client went away (killed or timed out)
+                    pass
+
+            def do_POST(self):
+                if self.path.split("?")[0] != QUERYDATA_PATH:
+                    return self.reply(404, b"{}")
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if len(body) < length:
+                    # Client went away in the middle of the request
+                    self.close_connection = True
+                    return
+                payload = json.loads(body)
+                response = endpoint.respond(payload)
+                if response is None:
+                    self.close_connection = True
+                    return
+                self.reply(*response)
+
+            def reply(self, status: int, body: bytes, headers: Optional[Dict] = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, payload) -> Optional[tuple]:
+        """(status, body, headers), None - drop connection"""
+        with self.lock:
+            self.requests += 1
+            fault = self.random.random()
+            if fault < self.drop_rate:
+                self.dropped += 1
+                return None
+            fault -= self.drop_rate
+            throttled = fault < self.throttle_rate
+            failed = not throttled and fault - self.throttle_rate < self.error_rate
+            if throttled:
+                self.throttled += 1
+            elif failed:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return 429, b'{"error": "Too Many Requests"}', {"Retry-After": f"{self.retry_after:g}"}
+        if failed:
+            return 503, b'{"error": "Service Unavailable"}'
+
+        command = payload["queries"][0]["Query"]["Commands"][0]["SemanticQueryDataShapeCommand"]
+        window = command["Binding"]["DataReduction"]["Primary"]["Window"]
+        count = min(window.get("Count", 500), self.max_window)
+        predicate = self.row_filter(command["Query"].get("Where", []))
+        page = self.report.page(token_offset(window.get("RestartTokens")), count, predicate)
+        return 200, json.dumps(page, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+
+    def row_filter(self, where: List[Dict]) -> Optional[Callable[[List], bool]]:
+        """Predicate of Where conditions on filter_columns, None - no such conditions (all rows)"""
+        predicates = [predicate for predicate in (compile_condition(item["Condition"], self.filter_columns)
+                                                  for item in where) if predicate is not None]
+        if not predicates:
+            return None
+        return lambda row: all(predicate(row) for predicate in predicates)
+
+    def start(self) -> "MockEndpoint":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-endpoint", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "MockEndpoint":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mock PowerBI querydata endpoint with synthetic data')
+    parser.add_argument('--rows', type=int, default=10000, help='Total rows')
+    parser.add_argument('--port', type=int, default=8000, help='Port')
+    parser.add_argument('--max-window', type=int, default=30000, help='Max rows per response')
+    parser.add_argument('--latency', type=float, default=0.0, help='Added latency per response (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests failing with 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests throttled with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After of throttled requests (seconds)')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Share of requests dropped without response')
+    parser.add_argument('--seed', type=int, default=0, help='Data seed')
+    args = parser.parse_args()
+
+    endpoint = MockEndpoint(SyntheticReport(args.rows, seed=args.seed), port=args.port, max_window=args.max_window,
+                            latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                            retry_after=args.retry_after, drop_rate=args.drop_rate)
+    print(f"Serving {args.rows} rows at {endpoint.url}")
+    try:
+        endpoint.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bench.mock_server import MockEndpoint
+from bench.synthetic import SyntheticReport
+from decoder import DecodePool, decode_response, get_columns_types, get_date_columns, get_dictionary_columns
+from main import PowerBIParserFinal
+from metrics import Metrics
+from report import DEFAULT_REPORT, ReportSpec
+from retry import CircuitBreaker, RetryPolicy
+from sinks import SINKS
+from transport import RateLimiter
+from window import PageWindow
+
+
+BENCHMARKS = ["parse", "decode", "write", "e2e", "faults", "memory"]
+# Fault mix of the faults benchmark: 503s, 429s and dropped connections
+FAULTS = {"error_rate": 0.1, "throttle_rate": 0.05, "retry_after": 0.05, "drop_rate": 0.05}
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+
+def parse_size(text: str) -> int:
+    """10k, 1M, 10M -> rows"""
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000 ** 2}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def bench_parse(rows: int, page_size: int) -> float:
+    """json.loads of response bodies"""
+    elapsed = 0.0
+    for page in SyntheticReport(rows).pages(page_size):
+        body = json.dumps(page, ensure_ascii=False)
+        started = time.perf_counter()
+        json.loads(body)
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+
+def bench_decode(rows: int, page_size: int) -> float:
+    """decode_response of parsed pages"""
+    elapsed = 0.0
+    for page in SyntheticReport(rows).pages(page_size):
+        started = time.perf_counter()
+        decode_response(page)
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+
+def bench_decode_pool(rows: int, page_size: int, workers: int) -> float:
+    """JSON parsing and decoding of raw response bodies in DecodePool worker processes"""
+    bodies = [json.dumps(page, ensure_ascii=False).encode("utf-8") for page in SyntheticReport(rows).pages(page_size)]
+    pool = DecodePool(workers)
+    try:
+        # Spawn workers before timing
+        pool.submit(bodies[0]).result()
+        started = time.perf_counter()
+        futures = [pool.submit(body) for body in bodies]
+        for future in futures:
+            future.result()
+        return time.perf_counter() - started
+    finally:
+        pool.close()
+
+
+def bench_write(rows: int, page_size: int, output_format: str, directory: str) -> float:
+    """Sink write_page + flush of decoded pages"""
+    sink_class = SINKS[output_format]
+    sink = sink_class(os.path.join(directory, "write" + sink_class.extension))
+    elapsed = 0.0
+    try:
+        for page in SyntheticReport(rows).pages(page_size):
+            columns, decoded, _ = decode_response(page, date_format=sink_class.date_format)
+            dictionary_columns = get_dictionary_columns(page)
+            date_columns = get_date_columns(get_columns_types(page))
+            started = time.perf_counter()
+            sink.write_page(columns, decoded, dictionary_columns, date_columns)
+            sink.flush()
+            elapsed += time.perf_counter() - started
+    finally:
+        started = time.perf_counter()
+        sink.close()
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+
+def e2e_parser(url: str, page_size: int, output_format: str, directory: str, backend: str = "requests",
+               decode_pool: Optional[DecodePool] = None, stream: bool = False) -> PowerBIParserFinal:
+    """Parser fetching from mock endpoint at url, fixed window of page_size"""
+    with open(DEFAULT_REPORT, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    return PowerBIParserFinal(
+        output_csv=os.path.join(directory, "e2e" + SINKS[output_format].extension),
+        checkpoint_file=os.path.join(directory, "e2e.json"),
+        backend=backend,
+        limiter=RateLimiter(rps=None),
+        output_format=output_format,
+        stream=stream,
+        window=PageWindow(page_size, max_count=page_size),
+        report=ReportSpec(dict(spec, url=url)),
+        metrics=Metrics(),
+        # Short delays and generous budgets, so injected faults cost little time and never abort the run
+        retry=RetryPolicy(timeouts=20, server=20, throttle=20, base=0.01, max_delay=0.1, seed=0),
+        breaker=CircuitBreaker(threshold=20, cooldown=0.1),
+        decode_pool=decode_pool
+    )
+
+
+def run_parser(parser: PowerBIParserFinal, rows: int, decode_workers: int = 1) -> float:
+    started = time.perf_counter()
+    try:
+        # Per-page progress lines would dominate the output
+        with contextlib.redirect_stdout(io.StringIO()):
+            total = parser.fetch_all_data(resume=False, decode_workers=decode_workers)
+    finally:
+        parser.transport.close()
+    elapsed = time.perf_counter() - started
+    if total != rows:
+        raise RuntimeError(f"e2e: fetched {total} of {rows} rows")
+    return elapsed
+
+
+def bench_e2e(rows: int, page_size: int, output_format: str, directory: str, backend: str = "requests",
+              faults: Optional[Dict] = None, decode_pool: Optional[DecodePool] = None, decode_workers: int = 1,
+              latency: float = 0.0) -> float:
+    """
+    fetch_all_data against local mock endpoint, faults: MockEndpoint fault options (all pages must still arrive)
+    latency: seconds added to each response, like a remote server
+    """
+    with MockEndpoint(SyntheticReport(rows), latency=latency, **(faults or {})) as endpoint:
+        parser = e2e_parser(endpoint.url, page_size, output_format, directory, backend, decode_pool)
+        return run_parser(parser, rows, decode_workers)
+
+
+def serve_mock(rows: int, connection):
+    """Mock endpoint process: sends its url, serves until the connection is closed"""
+    with MockEndpoint(SyntheticReport(rows)) as endpoint:
+        connection.send(endpoint.url)
+        try:
+            connection.recv()
+        except EOFError:
+            pass
+
+
+@contextlib.contextmanager
+def mock_process(rows: int):
+    """Mock endpoint in another process, so building its responses isn't traced with the scraper"""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=serve_mock, args=(rows, child), daemon=True)
+    process.start()
+    child.close()
+    try:
+        yield parent.recv()
+    finally:
+        parent.close()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+
+def bench_memory(rows: int, page_size: int, output_format: str, directory: str, backend: str = "requests",
+                 stream: bool = False) -> Tuple[float, int]:
+    """
+    fetch_all_data with tracemalloc: (seconds, peak traced bytes)
+    Peak grows with the window when whole responses are parsed, --stream should keep it flat
+    """
+    with mock_process(rows) as url:
+        parser = e2e_parser(url, page_size, output_format, directory, backend, stream=stream)
+        tracemalloc.start()
+        try:
+            elapsed = run_parser(parser, rows)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return elapsed, peak
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    results = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                continue
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Offline benchmarks on synthetic querydata responses')
+    parser.add_argument('--sizes', default='10k', help='Comma-separated row counts, e.g. "10k,1M,10M"')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help=f'Comma-separated: {", ".join(BENCHMARKS)}')
+    parser.add_argument('--page-size', type=int, default=5000, help='Rows per page')
+    parser.add_argument('--windows', default='500,5000,30000',
+                        help='Comma-separated windows (rows per request) of the memory benchmark')
+    parser.add_argument('--format', choices=list(SINKS), default='csv', help='Output format for write and e2e')
+    parser.add_argument('--backend', choices=['requests', 'async'], default='requests', help='HTTP backend for e2e')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to each mock response (e2e, faults), e.g. 0.2 for a remote server')
+    parser.add_argument('--decode-pool', choices=['thread', 'process'], default='thread',
+                        help='Decode in threads or worker processes (decode, e2e, faults)')
+    parser.add_argument('--decode-workers', type=int, default=1, help='Decode threads or processes')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='Results file (JSON lines)')
+    parser.add_argument('--no-save', action='store_true', help="Don't append results to history")
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    windows = [parse_size(window) for window in args.windows.split(',') if window.strip()]
+    benchmarks = [name.strip() for name in args.benchmarks.split(',') if name.strip()]
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    history = load_history(args.history)
+    commit = git_commit()
+    results = []
+
+    # Process pool is shared by e2e runs, like by the chains of a real run
+    pool = DecodePool(args.decode_workers) if args.decode_pool == "process" else None
+    suffix = f":process{args.decode_workers}" if pool else (f":thread{args.decode_workers}"
+                                                            if args.decode_workers > 1 else "")
+    latency = f":latency{args.latency:g}" if args.latency else ""
+
+    def record(label: str, rows: int, page_size: int, elapsed: float, peak: Optional[int] = None):
+        result = {
+            "timestamp": datetime.now().isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "benchmark": label,
+            "rows": rows,
+            "page_size": page_size,
+            "seconds": round(elapsed, 4),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else 0,
+        }
+        if peak is not None:
+            result["peak_mb"] = round(peak / 1024 ** 2, 2)
+        results.append(result)
+
+        previous = [r for r in history if r.get("benchmark") == label and r.get("rows") == rows
+                    and r.get("page_size") == page_size]
+        # Memory benchmarks compare peak memory, others throughput
+        key = "peak_mb" if peak is not None else "rows_per_sec"
+        comparison = f"peak {result['peak_mb']:.1f} MB   " if peak is not None else ""
+        if previous and previous[-1].get(key):
+            old = previous[-1]
+            change = (result[key] - old[key]) / old[key] * 100
+            comparison += f"{old[key]:.{1 if peak is not None else 0}f} ({change:+.0f}%, {old.get('commit') or '?'})"
+        print(f"{label:<36}{rows:>12}{elapsed:>10.2f}{result['rows_per_sec']:>12.0f}   {comparison}")
+
+    streams = [False]
+    if "memory" in benchmarks:
+        if importlib.util.find_spec("ijson"):
+            streams.append(True)
+        else:
+            print("memory: --stream path skipped, it requires ijson: pip install ijson")
+
+    print(f"{'benchmark':<36}{'rows':>12}{'seconds':>10}{'rows/s':>12}   previous")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            for name in benchmarks:
+                if name == "memory":
+                    # Window is recorded as page size
+                    for window in windows:
+                        for stream in streams:
+                            elapsed, peak = bench_memory(rows, window, args.format, directory, args.backend, stream)
+                            mode = "stream" if stream else "json"
+                            record(f"memory:{mode}:{args.format}:{args.backend}:w{window}", rows, window,
+                                   elapsed, peak)
+                    continue
+
+                if name == "parse":
+                    elapsed = bench_parse(rows, args.page_size)
+                elif name == "decode" and pool:
+                    elapsed = bench_decode_pool(rows, args.page_size, args.decode_workers)
+                elif name == "decode":
+                    elapsed = bench_decode(rows, args.page_size)
+                elif name == "write":
+                    elapsed = bench_write(rows, args.page_size, args.format, directory)
+                else:
+                    elapsed = bench_e2e(rows, args.page_size, args.format, directory, args.backend,
+                                        FAULTS if name == "faults" else None, pool, args.decode_workers, args.latency)
+
+                if name == "parse":
+                    label = name
+                elif name == "decode":
+                    label = name + (f":process{args.decode_workers}" if pool else "")
+                elif name == "write":
+                    label = f"{name}:{args.format}"
+                else:
+                    label = f"{name}:{args.format}:{args.backend}{suffix}{latency}"
+                record(label, rows, args.page_size, elapsed)
+
+    if pool is not None:
+        pool.close()
+
+    if not args.no_save:
+        with open(args.history, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+        print(f"Results appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import random
+from typing import Callable, Dict, List, Optional
+
+from decoder import DATETIME_TYPE
+
+
+# Column kinds of synthetic reports
+TEXT = "text"
+DICT = "dict"
+DATE = "date"
+NUMBER = "number"
+
+# 2015-01-01 .. 2025-01-01, Unix ms
+DATE_FROM = 1420070400000
+DATE_TO = 1735689600000
+
+WORDS = ["Main", "Street", "Columbus", "Ohio", "Store", "Market", "Bar", "Grill", "North", "South", "Avenue", "LLC"]
+
+
+# Rows are generated in blocks; only unique_blocks distinct blocks exist, so 10M rows stay cheap
+BLOCK_ROWS = 1024
+
+
+class SyntheticReport:
+    """
+    Deterministic querydata responses of a fake report, any page can be generated on its own:
+    - rows: total rows, RT token of a page is the offset of its next row
+    - first column is a unique, ordered key (like Account Number)
+    - repeat_density: share of values equal to the previous row ("R" bitset)
+    - null_density: share of null values ("Ø" bitset)
+    - kinds: column kinds (text, dict, date, number), dict columns use ValueDicts of dict_cardinality values
+    - newline_rate: share of text values with embedded newlines
+    """
+
+    def __init__(self, rows: int, kinds: Optional[List[str]] = None, repeat_density: float = 0.3,
+                 null_density: float = 0.1, dict_cardinality: int = 50, newline_rate: float = 0.02, seed: int = 0,
+                 unique_blocks: int = 16):
+        self.rows = rows
+        self.kinds = kinds or default_kinds()
+        self.repeat_density = repeat_density
+        self.null_density = null_density
+        self.dict_cardinality = dict_cardinality
+        self.newline_rate = newline_rate
+        self.seed = seed
+        self.unique_blocks = unique_blocks
+        self.columns = [f"Column {i}" for i in range(len(self.kinds))]
+        self.blocks: Dict[int, List[List]] = {}
+
+    def random_value(self, rng: random.Random, kind: str):
+        if rng.random() < self.null_density:
+            return None
+        if kind == DICT:
+            return f"Category {rng.randrange(self.dict_cardinality)}"
+        if kind == DATE:
+            return rng.randrange(DATE_FROM, DATE_TO) // 86400000 * 86400000
+        if kind == NUMBER:
+            return str(rng.randrange(1, 10 ** 6))
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        if rng.random() < self.newline_rate:
+            text += "\n" + rng.choice(WORDS)
+        return text
+
+    def block(self, index: int) -> List[List]:
+        """Rows of one block without key column"""
+        index %= self.unique_blocks
+        if index not in self.blocks:
+            rng = random.Random(self.seed * 7919 + index)
+            rows = []
+            prev = None
+            for _ in range(BLOCK_ROWS):
+                row = [prev[c] if prev is not None and rng.random() < self.repeat_density
+                       else self.random_value(rng, kind) for c, kind in enumerate(self.kinds)]
+                rows.append(row)
+                prev = row
+            self.blocks[index] = rows
+        return self.blocks[index]
+
+    def row(self, i: int) -> List:
+        """Logical (raw) values of row i"""
+        row = list(self.block(i // BLOCK_ROWS)[i % BLOCK_ROWS])
+        row[0] = f"{i:09d}"
+        return row
+
+    def expected_rows(self, start: int = 0, count: Optional[int] = None) -> List[List]:
+        """Logical (raw) values of rows, to check decoded output"""
+        end = self.rows if count is None else min(self.rows, start + count)
+        return [self.row(i) for i in range(start, end)]
+
+    def page(self, start: int = 0, count: int = 500, predicate: Optional[Callable[[List], bool]] = None) -> Dict:
+        """
+        Querydata response with up to count rows from row start on
+        predicate: only rows passing it (Where conditions), RT is the offset after the last scanned row
+        """
+        rows = []
+        end = start
+        while end < self.rows and len(rows) < count:
+            row = self.row(end)
+            end += 1
+            if predicate is None or predicate(row):
+                rows.append(row)
+        width = len(self.kinds)
+        dicts: List[Dict] = [{} for _ in range(width)]
+
+        # First row of a page never uses "R"
+        prev = None
+        dm0 = []
+        for row in rows:
+            item = {}
+            values = []
+            copy_bitset = null_bitset = 0
+            for c, value in enumerate(row):
+                if prev is not None and value == prev[c]:
+                    copy_bitset |= 1 << c
+                elif value is None:
+                    null_bitset |= 1 << c
+                elif self.kinds[c] == DICT:
+                    values.append(dicts[c].setdefault(value, len(dicts[c])))
+                else:
+                    values.append(value)
+            if prev is None:
+                item["S"] = [dict({"N": f"G{c}", "T": DATETIME_TYPE if self.kinds[c] == DATE else 1},
+                                  **({"DN": f"D{c}"} if self.kinds[c] == DICT else {}))
+                             for c in range(width)]
+            prev = row
+            item["C"] = values
+            if copy_bitset:
+                item["R"] = copy_bitset
+            if null_bitset:
+                item["Ø"] = null_bitset
+            dm0.append(item)
+
+        ds = {"N": "DS0", "PH": [{"DM0": dm0}], "IC": True, "HAD": True}
+        value_dicts = {f"D{c}": list(d) for c, d in enumerate(dicts) if self.kinds[c] == DICT}
+        if value_dicts:
+            ds["ValueDicts"] = value_dicts
+        if end < self.rows:
+            ds["RT"] = [[f"'{end}'"]]
+        return {
+            "jobIds": [],
+            "results": [{
+                "jobId": "00000000-0000-0000-0000-000000000000",
+                "result": {"data": {
+                    "descriptor": {"Select": [{
+                        "Kind": 1, "Depth": 0, "Value": f"G{c}", "Name": f"Synthetic.{name}",
+                        "GroupKeys": [{"Source": {"Entity": "Synthetic", "Property": name}, "Calc": f"G{c}",
+                                       "IsSameAsSelect": True}]
+                    } for c, name in enumerate(self.columns)]},
+                    "dsr": {"Version": 2, "MinorVersion": 1, "DS": [ds]}
+                }}
+            }]
+        }
+
+    def pages(self, count: int = 500):
+        """All pages in order"""
+        for start in range(0, self.rows, count):
+            yield self.page(start, count)
+
+
+def default_kinds() -> List[str]:
+    """24 columns shaped like the Ohio permits report"""
+    return ([NUMBER] + [TEXT] * 4 + [DICT] + [TEXT] + [DICT] * 4 + [DATE, TEXT, DATE, DATE]
+            + [NUMBER, DICT, DICT, DICT, TEXT, TEXT, DATE, TEXT, DICT])
+
+
+def token_offset(restart_tokens: Optional[List]) -> int:
+    """Row offset from RestartTokens of a request payload"""
+    if not restart_tokens:
+        return 0
+    return int(str(restart_tokens[0][0]).strip("'"))
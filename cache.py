@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import CancelledError, Future, InvalidStateError
+from typing import BinaryIO, Dict, Optional
+
+from transport import CHUNK_SIZE, TransportResponse
+
+
+class CacheMiss(Exception):
+    """Response is not in cache (replay mode)"""
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of raw querydata responses:
+    - key: hash of URL + payload (includes restart token, not page size)
+    - value: zlib-compressed response body
+    - file mtime is the write time (TTL), atime is the last use (LRU eviction)
+    Eviction scans the whole directory, so it frees space down to low_water of max_bytes
+    and runs once per many puts, not on every put over the limit
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3, ttl: Optional[float] = None,
+                 low_water: float = 0.9):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.low_water = low_water
+        self.lock = threading.Lock()
+        self.evict_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path in self.entries())
+
+    @staticmethod
+    def key(url: str, payload: Dict) -> str:
+        """
+        Key ignores page size (Window.Count): a cached page of another size
+        is still a valid answer, pagination continues from its restart token
+        """
+        payload = json.loads(json.dumps(payload))
+        for query in payload.get("queries", []):
+            for command in query.get("Query", {}).get("Commands", []):
+                binding = command.get("SemanticQueryDataShapeCommand", {}).get("Binding", {})
+                binding.get("DataReduction", {}).get("Primary", {}).get("Window", {}).pop("Count", None)
+        data = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256((url + "\n" + data).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".z")
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".z"):
+                    yield os.path.join(root, name)
+
+    def get(self, url: str, payload: Dict, ignore_ttl: bool = False) -> Optional[bytes]:
+        """Get cached response body, None if missing or expired"""
+        path = self.path(self.key(url, payload))
+        try:
+            stat = os.stat(path)
+            if not ignore_ttl and self.ttl and time.time() - stat.st_mtime > self.ttl:
+                self.remove(path)
+                self.misses += 1
+                return None
+            with open(path, 'rb') as f:
+                body = zlib.decompress(f.read())
+            # Mark as recently used, keep write time
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+    def put(self, url: str, payload: Dict, body: BinaryIO):
+        """Store response body, evicting least recently used entries over size limit"""
+        path = self.path(self.key(url, payload))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        compressor = zlib.compressobj(6)
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: body.read(CHUNK_SIZE), b""):
+                f.write(compressor.compress(chunk))
+            f.write(compressor.flush())
+        with self.lock:
+            if os.path.exists(path):
+                self.size -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+            self.size += os.path.getsize(path)
+        # One eviction at a time, other threads keep going
+        if self.size > self.max_bytes and self.evict_lock.acquire(blocking=False):
+            try:
+                self.evict()
+            finally:
+                self.evict_lock.release()
+
+    def remove(self, path: str):
+        with self.lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self.size -= size
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """Remove least recently used entries until cache fits in low_water of max_bytes"""
+        target = self.max_bytes * self.low_water
+        entries = []
+        for path in self.entries():
+            try:
+                stat = os.stat(path)
+                entries.append((stat.st_atime, stat.st_size, path))
+            except FileNotFoundError:
+                pass
+        entries.sort()
+        for _, _, path in entries:
+            if self.size <= target:
+                break
+            self.remove(path)
+
+
+class CachedTransport:
+    """Serves responses from cache, stores successful network responses"""
+
+    def __init__(self, transport, cache: ResponseCache):
+        self.transport = transport
+        self.cache = cache
+
+    def post(self, url: str, payload: Dict, stream: bool = False) -> TransportResponse:
+        body = self.cache.get(url, payload)
+        if body is not None:
+            return TransportResponse(200, {}, body)
+        response = self.transport.post(url, payload, stream)
+        if response.status_code == 200:
+            self.cache.put(url, payload, response.open())
+        return response
+
+    def submit(self, url: str, payload: Dict, stream: bool = False) -> Future:
+        body = self.cache.get(url, payload)
+        if body is not None:
+            future = Future()
+            future.set_result(TransportResponse(200, {}, body))
+            return future
+
+        # Response is handed over only after it is cached, so both never read body at once
+        inner = self.transport.submit(url, payload, stream)
+        outer = Future()
+
+        def store(done: Future):
+            try:
+                response = done.result()
+                if response.status_code == 200:
+                    self.cache.put(url, payload, response.open())
+                outer.set_result(response)
+            except CancelledError:
+                outer.cancel()
+            except InvalidStateError:
+                pass
+            except Exception as e:
+                outer.set_exception(e)
+
+        outer.add_done_callback(lambda f: inner.cancel() if f.cancelled() else None)
+        inner.add_done_callback(store)
+        return outer
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport:
+    """Serves responses only from cache, never touches the network"""
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+
+    def post(self, url: str, payload: Dict, stream: bool = False) -> TransportResponse:
+        body = self.cache.get(url, payload, ignore_ttl=True)
+        if body is None:
+            raise CacheMiss("Response is not cached, replay stopped")
+        return TransportResponse(200, {}, body)
+
+    def submit(self, url: str, payload: Dict, stream: bool = False) -> Future:
+        future = Future()
+        try:
+            future.set_result(self.post(url, payload, stream))
+        except CacheMiss as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        pass
@@ -0,0 +1,356 @@
+import json
+import re
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone, tzinfo
+from functools import lru_cache, partial
+from itertools import islice
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+DATE_FORMAT = "%m.%d.%Y"
+DEFAULT_TZ = "UTC"
+
+# "T" of a DateTime column in the "S" schema
+DATETIME_TYPE = 7
+
+# Distinct dates remembered per converter; permits share few distinct dates
+DATE_CACHE_SIZE = 65536
+
+
+def get_timezone(name: str) -> Optional[tzinfo]:
+    """Timezone by IANA name, "UTC", or "local" (None - host timezone)"""
+    if name == "local":
+        return None
+    if name.upper() == "UTC":
+        return timezone.utc
+    from zoneinfo import ZoneInfo
+    return ZoneInfo(name)
+
+
+def parse_date(value, tz: Optional[tzinfo]) -> Optional[datetime]:
+    """Unix timestamp (ms) or ISO string to datetime in tz, None if value is not a date"""
+    try:
+        if isinstance(value, str):
+            date_obj = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return date_obj.astimezone(tz) if date_obj.tzinfo is not None else date_obj
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return datetime.fromtimestamp(value / 1000, tz)
+    except (ValueError, OverflowError, OSError):
+        pass
+    return None
+
+
+@lru_cache(maxsize=None)
+def date_converter(tz: str = DEFAULT_TZ, date_format: Optional[str] = DATE_FORMAT) -> Callable:
+    """
+    Memoized converter of date column values, shared by all pages:
+    formatted string (or datetime.date if date_format is None), non-dates are returned as is
+    """
+    zone = get_timezone(tz)
+
+    @lru_cache(maxsize=DATE_CACHE_SIZE)
+    def convert(value):
+        date_obj = parse_date(value, zone)
+        if date_obj is None:
+            return value
+        return date_obj.strftime(date_format) if date_format else date_obj.date()
+
+    return convert
+
+
+def convert_value(value, newline_replacement: str = "", date_format: Optional[str] = DATE_FORMAT,
+                  tz: str = DEFAULT_TZ):
+    """
+    Convert single raw value of a column without type ("T") in the schema, guessing dates:
+    - strings: remove newlines, ISO dates to MM.dd.yyyy
+    - Unix timestamps (ms) to MM.dd.yyyy
+    Dates are returned as datetime.date objects if date_format is None
+    """
+    if isinstance(value, str):
+        if "T" in value and "-" in value and parse_date(value, None) is not None:
+            return date_converter(tz, date_format)(value)
+        return value.replace("\n", newline_replacement)
+    if isinstance(value, (int, float)) and value > 100000000000:
+        return date_converter(tz, date_format)(value)
+    return value
+
+
+def convert_text(value, newline_replacement: str = ""):
+    """Convert value of a typed non-date column: only newlines are removed"""
+    if isinstance(value, str):
+        return value.replace("\n", newline_replacement)
+    return value
+
+
+def build_plan(columns_types: List[Dict], value_dicts: Dict, newline_replacement: str = "",
+               date_format: Optional[str] = DATE_FORMAT, tz: str = DEFAULT_TZ,
+               date_columns: frozenset = frozenset()) -> List[Callable]:
+    """
+    Build one converter per column from "S" schema:
+    - date columns (in date_columns, or "T" is DateTime): memoized date_converter
+    - other typed columns: newline removal only
+    - columns without "T": convert_value, dates are guessed from values
+    - dictionary columns ("DN"): index lookup in a dictionary converted once per page
+    """
+    plan = []
+    for i, col in enumerate(columns_types):
+        if i in date_columns or col.get("T") == DATETIME_TYPE:
+            convert = date_converter(tz, date_format)
+        elif "T" in col:
+            convert = partial(convert_text, newline_replacement=newline_replacement)
+        else:
+            convert = partial(convert_value, newline_replacement=newline_replacement, date_format=date_format, tz=tz)
+
+        if "DN" in col and col["DN"] in value_dicts:
+            values = [convert(v) for v in value_dicts[col["DN"]]]
+
+            def lookup(value, values=values, convert=convert):
+                if isinstance(value, int):
+                    return values[value]
+                return convert(value)
+
+            plan.append(lookup)
+        else:
+            plan.append(convert)
+    return plan
+
+
+def iter_rows(dm0: Iterable[Dict], columns_types: List[Dict], value_dicts: Dict, newline_replacement: str = "",
+              date_format: Optional[str] = DATE_FORMAT, plan: Optional[List[Callable]] = None,
+              tz: str = DEFAULT_TZ, date_columns: frozenset = frozenset()) -> Iterator[List]:
+    """
+    Decode DM0 rows in a single pass:
+    - "R" bitset: copy previous (already decoded) value
+    - "\u00d8" bitset: null value
+    - other values are taken from "C" in order and converted by column plan
+    """
+    length = len(columns_types)
+    plan = plan or build_plan(columns_types, value_dicts, newline_replacement, date_format, tz, date_columns)
+    columns = range(length)
+
+    prev = [None] * length
+    for item in dm0:
+        values = item["C"]
+        copy_bitset = item.get("R", 0)
+        null_bitset = item.get("\u00d8", 0)
+
+        if copy_bitset or null_bitset:
+            row = [None] * length
+            pos = 0
+            for i in columns:
+                bit = 1 << i
+                if copy_bitset & bit:
+                    row[i] = prev[i]
+                elif not null_bitset & bit and pos < len(values):
+                    row[i] = plan[i](values[pos])
+                    pos += 1
+        else:
+            row = [convert(value) for convert, value in zip(plan, values)]
+
+        yield row
+        prev = row
+
+
+def decode_rows(dm0: List[Dict], value_dicts: Dict, newline_replacement: str = "",
+                date_format: Optional[str] = DATE_FORMAT, timings: Optional[Dict] = None,
+                tz: str = DEFAULT_TZ, date_columns: frozenset = frozenset()) -> List[List]:
+    """
+    Decode all rows of DM0 list
+    timings: if given, seconds spent on dictionary expansion ("decode_dicts")
+    and on row decoding with bitsets and value conversion ("decode_rows") are stored in it
+    """
+    if timings is None:
+        return list(iter_rows(dm0, dm0[0]["S"], value_dicts, newline_replacement, date_format,
+                              tz=tz, date_columns=date_columns))
+    started = time.perf_counter()
+    plan = build_plan(dm0[0]["S"], value_dicts, newline_replacement, date_format, tz, date_columns)
+    planned = time.perf_counter()
+    rows = list(iter_rows(dm0, dm0[0]["S"], value_dicts, newline_replacement, date_format, plan))
+    timings["decode_dicts"] = planned - started
+    timings["decode_rows"] = time.perf_counter() - planned
+    return rows
+
+
+def get_columns(data: Dict) -> List[str]:
+    """Extract column names from descriptor"""
+    return [
+        item["GroupKeys"][0]["Source"]["Property"] if item.get("Kind") == 1 else item.get("Value", "")
+        for item in data["descriptor"]["Select"]
+    ]
+
+
+def get_dictionary_columns(response_data: Dict) -> set:
+    """Get indexes of dictionary-encoded ("DN") columns"""
+    ds = response_data["results"][0]["result"]["data"]["dsr"]["DS"][0]
+    return {i for i, col in enumerate(ds["PH"][0]["DM0"][0]["S"]) if "DN" in col}
+
+
+def get_date_columns(columns_types: List[Dict], date_columns: frozenset = frozenset()) -> set:
+    """Indexes of date columns: declared in report spec (date_columns) or DateTime ("T") in "S" schema"""
+    return {i for i, col in enumerate(columns_types) if i in date_columns or col.get("T") == DATETIME_TYPE}
+
+
+def get_columns_types(response_data: Dict) -> List[Dict]:
+    """"S" schema of the first DM0 row"""
+    ds = response_data["results"][0]["result"]["data"]["dsr"]["DS"][0]
+    return ds["PH"][0]["DM0"][0]["S"]
+
+
+def decode_response(response_data: Dict, newline_replacement: str = "", date_format: Optional[str] = DATE_FORMAT,
+                    timings: Optional[Dict] = None, tz: str = DEFAULT_TZ,
+                    date_columns: frozenset = frozenset()) -> tuple[List[str], List[List], Optional[List]]:
+    """
+    Decode querydata response
+    Returns: (columns, rows, restart_token)
+    """
+    data = response_data["results"][0]["result"]["data"]
+    ds = data["dsr"]["DS"][0]
+    dm0 = ds["PH"][0]["DM0"]
+
+    rows = decode_rows(dm0, ds.get("ValueDicts", {}), newline_replacement, date_format, timings, tz, date_columns)
+    token = ds["RT"][0] if ds.get("RT") else None
+
+    return get_columns(data), rows, token
+
+
+# ==================== PROCESS POOL ====================
+
+RT_KEY = re.compile(rb'"RT"\s*:\s*')
+
+
+def scan_restart_token(body: bytes) -> Optional[List]:
+    """
+    Restart token from raw response body without parsing the whole body
+    Raises ValueError if the body has no unique "RT" key (caller falls back to json.loads)
+    """
+    matches = list(islice(RT_KEY.finditer(body), 2))
+    if not matches:
+        return None
+    if len(matches) > 1:
+        raise ValueError("ambiguous RT key")
+    rt, _ = json.JSONDecoder().raw_decode(body[matches[0].end():].decode("utf-8"))
+    return rt[0] if rt else None
+
+
+def decode_body(body: bytes, newline_replacement: str = "", date_format: Optional[str] = DATE_FORMAT,
+                tz: str = DEFAULT_TZ, date_columns: frozenset = frozenset()) -> tuple:
+    """
+    Parse and decode raw response body, runs in DecodePool worker processes
+    Returns: (columns, rows, row_count, restart_token, dictionary_columns, date_columns, timings);
+    columns is None for empty page
+    """
+    timings = {}
+    started = time.perf_counter()
+    response_data = json.loads(body)
+    timings["parse"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    try:
+        dm0 = response_data["results"][0]["result"]["data"]["dsr"]["DS"][0]["PH"][0]["DM0"]
+    except (KeyError, IndexError):
+        dm0 = []
+    if not dm0:
+        return None, [], 0, None, set(), set(), timings
+    columns, rows, token = decode_response(response_data, newline_replacement, date_format, timings, tz, date_columns)
+    timings["decode"] = time.perf_counter() - started
+    return (columns, rows, len(rows), token, get_dictionary_columns(response_data),
+            get_date_columns(get_columns_types(response_data), date_columns), timings)
+
+
+class DecodePool:
+    """
+    Decodes pages in worker processes, shared by all chains of a run:
+    - workers receive raw response bytes, JSON is parsed only once, in the worker
+    - rows come back pickled; repeated values (dictionaries, "R" copies) are the same objects, so pickle stores them once
+    Processes are spawned, not forked: the pool is used from a multithreaded process
+    """
+
+    def __init__(self, workers: int):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, body: bytes, newline_replacement: str = "", date_format: Optional[str] = DATE_FORMAT,
+               tz: str = DEFAULT_TZ, date_columns: frozenset = frozenset()) -> Future:
+        """Decode body in background, returns Future of decode_body result"""
+        return self.executor.submit(decode_body, body, newline_replacement, date_format, tz, date_columns)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ==================== STREAMING ====================
+
+DATA_PREFIX = "results.item.result.data"
+DS_PREFIX = DATA_PREFIX + ".dsr.DS.item"
+DM0_PREFIX = DS_PREFIX + ".PH.item.DM0.item"
+
+
+class StreamedPage:
+    """
+    Querydata response read from file with ijson, without loading it whole:
+    - first pass: descriptor, ValueDicts, RT, "S" schema and row count
+    - second pass (iter_rows): DM0 rows decoded one at a time
+    """
+
+    def __init__(self, body_file: BinaryIO):
+        try:
+            import ijson
+        except ImportError:
+            raise RuntimeError("Streaming requires ijson: pip install ijson")
+        self.ijson = ijson
+        self.body_file = body_file
+
+        wanted = {
+            DATA_PREFIX + ".descriptor": None,
+            DS_PREFIX + ".ValueDicts": None,
+            DS_PREFIX + ".RT": None,
+            DM0_PREFIX + ".S": None,
+        }
+        self.size = 0
+        builder = None
+        target = None
+        depth = 0
+
+        body_file.seek(0)
+        for prefix, event, value in ijson.parse(body_file, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if event in ("start_map", "start_array"):
+                    depth += 1
+                elif event in ("end_map", "end_array"):
+                    depth -= 1
+                    if depth == 0:
+                        wanted[target] = builder.value
+                        builder = None
+            elif prefix in wanted and wanted[prefix] is None and event in ("start_map", "start_array"):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                target = prefix
+                depth = 1
+            elif prefix == DM0_PREFIX and event == "start_map":
+                self.size += 1
+
+        self.descriptor = wanted[DATA_PREFIX + ".descriptor"] or {"Select": []}
+        self.value_dicts = wanted[DS_PREFIX + ".ValueDicts"] or {}
+        self.token = wanted[DS_PREFIX + ".RT"][0] if wanted[DS_PREFIX + ".RT"] else None
+        self.columns_types = wanted[DM0_PREFIX + ".S"] or []
+        self.columns = get_columns({"descriptor": self.descriptor})
+        self.dictionary_columns = {i for i, col in enumerate(self.columns_types) if "DN" in col}
+
+    def iter_rows(self, newline_replacement: str = "", date_format: Optional[str] = DATE_FORMAT,
+                  tz: str = DEFAULT_TZ, date_columns: frozenset = frozenset()) -> Iterator[List]:
+        """Decode DM0 rows one at a time, body file is closed when done"""
+        self.body_file.seek(0)
+        items = self.ijson.items(self.body_file, DM0_PREFIX, use_float=True)
+        try:
+            yield from iter_rows(items, self.columns_types, self.value_dicts, newline_replacement, date_format,
+                                 tz=tz, date_columns=date_columns)
+        finally:
+            self.close()
+
+    def close(self):
+        self.body_file.close()
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def fsync_path(path: str):
+    """Flush file (or directory entry) contents to disk"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class CheckpointJournal:
+    """
+    Write-ahead checkpoint journal, one JSON line per commit:
+    - record: restart token, total records, output byte offset (None if output can't be truncated),
+      done flag after the last page, so a finished chain is not fetched again
+    - commit order: output fsync, then journal line + fsync, so a committed record never points past durable data
+    - pages are committed in groups (every N pages or T seconds), a crash loses at most one group,
+      which is fetched again after the output is truncated back to the last committed offset
+    - torn last line (crash during write) is ignored on load
+    Old single-object checkpoint.json files are read as a record without offset
+    """
+
+    def __init__(self, path: str, every: int = 10, interval: float = 5.0, compact_after: int = 1000):
+        self.path = path
+        self.every = every
+        self.interval = interval
+        self.compact_after = compact_after
+        self.pending: Optional[Dict] = None
+        self.pending_pages = 0
+        self.last_commit = time.monotonic()
+        self.lines = 0
+        self.file = None
+
+    def load(self) -> Optional[Dict]:
+        """Last committed record, None if there is none"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        # Legacy format: one pretty-printed JSON object
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict) and 'records_processed' in data:
+                return {'token': data.get('last_token'), 'records': data.get('records_processed', 0), 'offset': None}
+        except ValueError:
+            pass
+
+        record = None
+        for line in text.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+        return record
+
+    def open(self, record: Optional[Dict] = None):
+        """Start journal with given record (None - empty), replacing old file atomically"""
+        self.rewrite([record] if record else [])
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def rewrite(self, records: List[Dict]):
+        temp = self.path + ".tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+        fsync_path(os.path.dirname(os.path.abspath(self.path)))
+        self.lines = len(records)
+
+    def append(self, sink, token: Optional[List], records: int, done: bool = False):
+        """Record page written to sink, commit if group is full or chain is done"""
+        self.pending = {'token': token, 'records': records, 'done': done}
+        self.pending_pages += 1
+        if done or self.pending_pages >= self.every or time.monotonic() - self.last_commit >= self.interval:
+            self.commit(sink)
+
+    def discard(self):
+        """Forget uncommitted pages, they will be fetched again"""
+        self.pending = None
+        self.pending_pages = 0
+
+    def commit(self, sink):
+        """Make pending record durable"""
+        if self.pending is None:
+            return
+        record = dict(self.pending, offset=sink.commit(), timestamp=datetime.now().isoformat())
+        if self.lines >= self.compact_after:
+            self.file.close()
+            self.rewrite([record])
+            self.file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.lines += 1
+        self.discard()
+        self.last_commit = time.monotonic()
+
+    def close(self, sink):
+        """Commit pending record, sink must still be open"""
+        try:
+            self.commit(sink)
+        finally:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -1,438 +1,976 @@
 
-import requests
 import json
-import csv
 import os
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import Callable, Iterator, List, Dict, Optional
+from datetime import datetime, timedelta
 import time
+import heapq
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+from cache import CacheMiss, CachedTransport, ReplayTransport, ResponseCache
+from decoder import (DATE_FORMAT, DEFAULT_TZ, DecodePool, StreamedPage, decode_response, get_columns_types,
+                     get_date_columns, get_dictionary_columns, get_timezone, scan_restart_token)
+from journal import CheckpointJournal
+from metrics import Metrics, Profiler, append_history, print_comparison
+from records import RecordBatch, ScrapeState
+from pipeline import DONE, Pipeline, Stopped
+from report import DEFAULT_REPORT, ReportSpec, literal
+from retry import THROTTLE, CircuitBreaker, HostBreakers, RetryPolicy, parse_retry_after
+from sinks import SINKS, get_sink_class
+from sync import SyncIndex, apply_full_sync, apply_narrowed_sync, read_groups
+from transport import HostRateLimiters, RateLimiter, create_transport
+from window import PageWindow
+
+
+ACCOUNT_NUMBER_COLUMN = {"Column": {"Expression": {"SourceRef": {"Source": "d"}}, "Property": "Account Number"}}
+COUNTY_COLUMN = {"Column": {"Expression": {"SourceRef": {"Source": "t"}}, "Property": "County"}}
+
+# PowerBI ComparisonKind values
+GREATER_THAN_OR_EQUAL = 2
+LESS_THAN = 3
+
+
+def account_range_partitions(bounds: List[str]) -> List[Dict]:
+    """
+    Split dataset into disjoint Account Number ranges:
+    (< b0), [b0, b1), ..., (>= bn)
+    Partitions follow OrderBy, so their outputs can simply be concatenated
+    """
+    bounds = sorted(bounds)
+    partitions = []
+    for i in range(len(bounds) + 1):
+        where = []
+        if i > 0:
+            where.append({"Condition": {"Comparison": {
+                "ComparisonKind": GREATER_THAN_OR_EQUAL, "Left": ACCOUNT_NUMBER_COLUMN, "Right": literal(bounds[i - 1])}}})
+        if i < len(bounds):
+            where.append({"Condition": {"Comparison": {
+                "ComparisonKind": LESS_THAN, "Left": ACCOUNT_NUMBER_COLUMN, "Right": literal(bounds[i])}}})
+        partitions.append({"name": f"p{i}", "where": where, "ordered": True})
+    return partitions
+
+
+def county_partitions(groups: List[List[str]]) -> List[Dict]:
+    """
+    Split dataset by County "In" lists, plus one partition for all other counties
+    Partitions overlap in Account Number order, so their outputs must be merged
+    """
+    partitions = []
+    all_counties = []
+    for i, group in enumerate(groups):
+        values = [[literal(county)] for county in group]
+        all_counties.extend(values)
+        partitions.append({"name": f"p{i}", "where": [
+            {"Condition": {"In": {"Expressions": [COUNTY_COLUMN], "Values": values}}}
+        ], "ordered": False})
+    partitions.append({"name": f"p{len(groups)}", "where": [
+        {"Condition": {"Not": {"Expression": {"In": {"Expressions": [COUNTY_COLUMN], "Values": all_counties}}}}}
+    ], "ordered": False})
+    return partitions
+
+
+def account_partitions(accounts: List[str], size: int = 500) -> List[Dict]:
+    """
+    Split Account Number list into "In" lists of at most size accounts
+    Accounts must be in OrderBy order, so partition outputs can simply be concatenated
+    """
+    partitions = []
+    for i in range(0, len(accounts), size):
+        values = [[literal(account)] for account in accounts[i:i + size]]
+        partitions.append({"name": f"a{i // size}", "where": [
+            {"Condition": {"In": {"Expressions": [ACCOUNT_NUMBER_COLUMN], "Values": values}}}
+        ], "ordered": True})
+    return partitions
+
+
+def date_since_condition(since: datetime) -> Dict:
+    """Where condition: any of Submitted / Issue / End Date >= since"""
+    since_literal = {"Literal": {"Value": f"datetime'{since.strftime('%Y-%m-%dT00:00:00')}'"}}
+    condition = None
+    for column in ["Submitted Date", "Issue Date", "End Date"]:
+        comparison = {"Comparison": {
+            "ComparisonKind": GREATER_THAN_OR_EQUAL,
+            "Left": {"Column": {"Expression": {"SourceRef": {"Source": "p1"}}, "Property": column}},
+            "Right": since_literal
+        }}
+        condition = comparison if condition is None else {"Or": {"Left": condition, "Right": comparison}}
+    return {"Condition": condition}
 
 
 class PowerBIParserFinal:
-    def __init__(self, output_csv: str = "result.csv", checkpoint_file: str = "checkpoint.json"):
-        self.base_url = "https://wabi-us-gov-virginia-api.analysis.usgovcloudapi.net/public/reports/querydata?synchronous=true"
-        self.headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-            'ActivityId': '0442498d-f0ef-dddd-aede-067f2528e0e5',
-            'Cache-Control': 'no-cache',
-            'Content-Type': 'application/json;charset=UTF-8',
-            'Origin': 'https://app.powerbigov.us',
-            'Referer': 'https://app.powerbigov.us/',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'X-PowerBI-ResourceKey': 'bedd740d-2544-405d-b74b-578d6f1c4674',
-        }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+    def __init__(self, output_csv: str = "result.csv", checkpoint_file: str = "checkpoint.json",
+                 extra_where: Optional[List[Dict]] = None, label: str = "",
+                 stop_event: Optional[threading.Event] = None, transport=None, backend: str = "requests",
+                 limiter: Optional[RateLimiter] = None, pool_size: int = 4, output_format: Optional[str] = "csv",
+                 cache: Optional[ResponseCache] = None, replay: bool = False, stream: bool = False,
+                 window: Optional[PageWindow] = None, commit_every: int = 10, commit_interval: float = 5.0,
+                 report: Optional[ReportSpec] = None, metrics: Optional[Metrics] = None, tz: str = DEFAULT_TZ,
+                 date_format: Optional[str] = None, retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, timeout: float = 30,
+                 decode_pool: Optional[DecodePool] = None, log: Optional[Callable[[str], None]] = print):
+        self.report = report or ReportSpec.load(DEFAULT_REPORT)
+        self.base_url = self.report.url
+        self.headers = self.report.headers()
+        if replay:
+            # Responses only from cache, no network
+            self.transport = ReplayTransport(cache)
+        else:
+            self.transport = transport or create_transport(backend, self.headers, limiter=limiter, pool_size=pool_size,
+                                                           timeout=timeout)
+            if cache is not None:
+                self.transport = CachedTransport(self.transport, cache)
         self.output_csv = output_csv
+        self.output_format = output_format
+        self.stream = stream
+        self.window = window or PageWindow()
+        self.metrics = metrics or Metrics()
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.decode_pool = decode_pool
+        # Messages of fetch stage (retries, errors), None - silent
+        self.log = log or (lambda message: None)
+        # No output format: batches only (iter_batches), dates stay datetime.date unless date_format is given
+        self.sink_class = get_sink_class(output_format) if output_format else None
+        if self.sink_class is None:
+            self.date_format = date_format
+        else:
+            # Sinks with native date type (date_format None) always get datetime.date
+            self.date_format = (date_format or self.sink_class.date_format) if self.sink_class.date_format else None
+        self.tz = tz
+        self.date_columns = self.report.date_columns()
         self.checkpoint_file = checkpoint_file
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.journal = CheckpointJournal(checkpoint_file, every=commit_every, interval=commit_interval)
+        self.extra_where = extra_where or []
+        self.template = self.report.compile().with_where(self.extra_where)
+        self.label = label
+        self.stop_event = stop_event or threading.Event()
+        self.completed = False
+        self.total_records = 0
 
     def load_checkpoint(self) -> tuple[Optional[List], int]:
-        """Load checkpoint from file"""
-        if os.path.exists(self.checkpoint_file):
-            try:
-                with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    print(f"\u2713 Checkpoint loaded: {data['records_processed']} records")
-                    return data.get('last_token'), data.get('records_processed', 0)
-            except Exception as e:
-                print(f"\u26a0\ufe0f Error loading checkpoint: {e}")
-        return None, 0
-
-    def save_checkpoint(self, token: Optional[List], count: int):
-        """Save checkpoint to file"""
-        try:
-            checkpoint = {
-                'last_token': token,
-                'records_processed': count,
-                'timestamp': datetime.now().isoformat()
-            }
-            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
-                json.dump(checkpoint, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"\u26a0\ufe0f Error saving checkpoint: {e}")
-
-    def get_base_payload(self, restart_tokens: Optional[List] = None) -> Dict:
-        """Create base payload for API request"""
-        payload = {
-            "version": "1.0.0",
-            "queries": [{
-                "Query": {
-                    "Commands": [{
-                        "SemanticQueryDataShapeCommand": {
-                            "Query": {
-                                "Version": 2,
-                                "From": [
-                                    {"Name": "d", "Entity": "Account", "Type": 0},
-                                    {"Name": "p", "Entity": "Permit Class Type", "Type": 0},
-                                    {"Name": "p1", "Entity": "Permit Transaction", "Type": 0},
-                                    {"Name": "p2", "Entity": "Permit Header", "Type": 0},
-                                    {"Name": "p3", "Entity": "Permit Status", "Type": 0},
-                                    {"Name": "t", "Entity": "Taxing District", "Type": 0},
-                                    {"Name": "p4", "Entity": "Parent Account", "Type": 0},
-                                    {"Name": "p5", "Entity": "Permit Submission Type", "Type": 0}
-                                ],
-                                "Select": [
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Account Number"}, "Name": "Account.Account Number",
-                                     "NativeReferenceName": "Permit Number"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}}, "Property": "DBA Name"},
-                                     "Name": "Account.DBA Name", "NativeReferenceName": "DBA Name1"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Address 1 Street 1 2"},
-                                     "Name": "Account.Address 1 Street 1 2", "NativeReferenceName": "Address"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Address 1 City"}, "Name": "Account.Address 1 City",
-                                     "NativeReferenceName": "City1"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Address 1 PostalCode"},
-                                     "Name": "Account.Address 1 PostalCode", "NativeReferenceName": "Postal Code"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p"}},
-                                                "Property": "Permit Class"}, "Name": "Permit Class Type.Permit Class",
-                                     "NativeReferenceName": "Permit Class"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Address 1 StateorProvince"},
-                                     "Name": "Account.Address 1 StateorProvince", "NativeReferenceName": "State"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p3"}},
-                                                "Property": "Public Status"}, "Name": "Permit Status.Public Status",
-                                     "NativeReferenceName": "Status"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "t"}},
-                                                "Property": "Tax District Number"},
-                                     "Name": "Taxing District.Tax District Number",
-                                     "NativeReferenceName": "Tax District Number"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "t"}}, "Property": "County"},
-                                     "Name": "Taxing District.County", "NativeReferenceName": "County"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "t"}},
-                                                "Property": "Muni/Township"}, "Name": "Taxing District.Muni/Township",
-                                     "NativeReferenceName": "Muni/Township"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p1"}},
-                                                "Property": "Submitted Date"},
-                                     "Name": "Permit Transaction.Submitted Date",
-                                     "NativeReferenceName": "Submitted Date"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Address 2 FullAddress"},
-                                     "Name": "Account.Address 2 FullAddress", "NativeReferenceName": "Alt Address"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p1"}}, "Property": "End Date"},
-                                     "Name": "Permit Transaction.End Date", "NativeReferenceName": "End Date"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p1"}},
-                                                "Property": "Issue Date"}, "Name": "Permit Transaction.Issue Date",
-                                     "NativeReferenceName": "Issued Date"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Wholesale Store Number"},
-                                     "Name": "Account.Wholesale Store Number",
-                                     "NativeReferenceName": "Wholesale Store Number"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Is In Safekeeping"}, "Name": "Account.Is In Safekeeping",
-                                     "NativeReferenceName": "Is In Safekeeping"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Is Intemporary Closing Authority"},
-                                     "Name": "Account.Is Intemporary Closing Authority",
-                                     "NativeReferenceName": "Closing Authority"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p2"}}, "Property": "Site Vote"},
-                                     "Name": "Permit Header.Site Vote", "NativeReferenceName": "Site Vote"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Legacy Permit Number"},
-                                     "Name": "Account.Legacy Permit Number", "NativeReferenceName": "Legacy Permit #"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                "Property": "Account Name"}, "Name": "Account.Account Name",
-                                     "NativeReferenceName": "Location Name"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p1"}},
-                                                "Property": "Original Issue Date"},
-                                     "Name": "Permit Transaction.Original Issue Date",
-                                     "NativeReferenceName": "Original Issue Date"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p4"}},
-                                                "Property": "Account Name"}, "Name": "Parent Account.Account Name",
-                                     "NativeReferenceName": "Permit Holder"},
-                                    {"Column": {"Expression": {"SourceRef": {"Source": "p5"}},
-                                                "Property": "Submission Type Template"},
-                                     "Name": "Permit Submission Type.Submission Type Template",
-                                     "NativeReferenceName": "Application Type"}
-                                ],
-                                "Where": [
-                                    {"Condition": {"Not": {"Expression": {"In": {"Expressions": [{"Column": {
-                                        "Expression": {"SourceRef": {"Source": "p3"}}, "Property": "Public Status"}}],
-                                                                                 "Values": [
-                                                                                     [{"Literal": {"Value": "null"}}],
-                                                                                     [{"Literal": {
-                                                                                         "Value": "'Ignore'"}}]]}}}}},
-                                    {"Condition": {"Not": {"Expression": {"Comparison": {"ComparisonKind": 0, "Left": {
-                                        "Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                                   "Property": "Account Number"}}, "Right": {
-                                        "Literal": {"Value": "null"}}}}}}},
-                                    {"Condition": {"In": {"Expressions": [{"Column": {
-                                        "Expression": {"SourceRef": {"Source": "d"}},
-                                        "Property": "Location Permit Group"}}], "Values": [
-                                        [{"Literal": {"Value": "'Retailer/Restaurant/Bar'"}}],
-                                        [{"Literal": {"Value": "'Temporary Permits'"}}]]}}}
-                                ],
-                                "OrderBy": [{"Direction": 1, "Expression": {
-                                    "Column": {"Expression": {"SourceRef": {"Source": "d"}},
-                                               "Property": "Account Number"}}}]
-                            },
-                            "Binding": {
-                                "Primary": {
-                                    "Groupings": [{"Projections": [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15,
-                                                                   16, 17, 18, 19, 20, 21, 22, 23], "Subtotal": 1}]
-                                },
-                                "DataReduction": {
-                                    "DataVolume": 3,
-                                    "Primary": {"Window": {"Count": 500}}
-                                },
-                                "Version": 1
-                            },
-                            "ExecutionMetricsKind": 1
-                        }
-                    }],
-                    "QueryId": ""
-                }
-            }],
-            "cancelQueries": [],
-            "modelId": 1603692
-        }
-
-        if restart_tokens:
-            payload["queries"][0]["Query"]["Commands"][0]["SemanticQueryDataShapeCommand"]["Binding"]["DataReduction"][
-                "Primary"]["Window"]["RestartTokens"] = [restart_tokens]
-
-        return payload
-
-    # ==================== JSON PROCESSING FUNCTIONS ====================
-
-    def is_bit_set_for_index(self, index, bitset):
-        """Check if bit is set at given index"""
-        return (bitset >> index) & 1 == 1
-
-    def reconstruct_arrays(self, columns_types, dm0):
         """
-        Reconstruct arrays by applying bitsets:
-        - "R" bitset: copy previous values
-        - "\u00d8" bitset: set null values
+        Load last committed checkpoint and start a new journal from it
+        Output is restored to the last commit (truncated, uncommitted parquet pieces dropped),
+        so pages written after it are fetched again; output that can't be restored is started over
         """
-        length = len(columns_types)
-        prevItem = None
-
-        for item in dm0:
-            currentItem = item["C"]
-            if "R" in item or "\u00d8" in item:
-                copyBitset = item.get("R", 0)
-                deleteBitSet = item.get("\u00d8", 0)
-                for i in range(length):
-                    if self.is_bit_set_for_index(i, copyBitset):
-                        currentItem.insert(i, prevItem[i])
-                    elif self.is_bit_set_for_index(i, deleteBitSet):
-                        currentItem.insert(i, None)
-            prevItem = currentItem
-
-    def expand_values(self, columns_types, dm0, value_dicts):
-        """Substitute indexes with actual values from value dictionaries"""
-        for (idx, col) in enumerate(columns_types):
-            if "DN" in col:
-                for item in dm0:
-                    dataItem = item["C"]
-                    if isinstance(dataItem[idx], int):
-                        valDict = value_dicts[col["DN"]]
-                        dataItem[idx] = valDict[dataItem[idx]]
-
-    def replace_newlines_with(self, dm0, replacement=""):
-        """Replace newline characters in string values"""
-        for item in dm0:
-            elem = item["C"]
-            for i in range(len(elem)):
-                if isinstance(elem[i], str):
-                    elem[i] = elem[i].replace("\
-", replacement)
-
-    def convert_timestamps_to_dates(self, dm0):
-        """Convert Unix timestamps to MM.dd.yyyy format"""
-        for item in dm0:
-            elem = item["C"]
-            for i in range(len(elem)):
-                # Check if value is a number (timestamp)
-                if isinstance(elem[i], (int, float)) and elem[i] > 100000000000:
-                    try:
-                        timestamp_seconds = elem[i] / 1000
-                        date_obj = datetime.fromtimestamp(timestamp_seconds)
-                        elem[i] = date_obj.strftime("%m.%d.%Y")
-                    except:
-                        pass
-                # Handle ISO format dates
-                elif isinstance(elem[i], str) and "T" in elem[i] and "-" in elem[i]:
-                    try:
-                        date_obj = datetime.fromisoformat(elem[i].replace("Z", "+00:00"))
-                        elem[i] = date_obj.strftime("%m.%d.%Y")
-                    except:
-                        pass
+        try:
+            record = self.journal.load()
+        except Exception as e:
+            print(f"\u26a0\ufe0f Error loading checkpoint: {e}")
+            record = None
+
+        if record:
+            restored, message = self.sink_class.restore(self.output_csv, record)
+            if not restored:
+                print(f"\u26a0\ufe0f {message}, starting over")
+                record = None
+            elif message:
+                print(f"\u2713 {message}")
+
+        if record:
+            print(f"\u2713 Checkpoint loaded: {record['records']} records")
+            self.completed = bool(record.get('done'))
+        self.journal.open(record)
+        return (record['token'], record['records']) if record else (None, 0)
+
+    def get_base_payload(self, restart_tokens: Optional[List] = None, count: Optional[int] = None) -> Dict:
+        """Create payload for API request from compiled report template (count - page size, default: current window)"""
+        return self.template.render(restart_tokens, count or self.window.count)
 
     # ==================== RESPONSE PROCESSING ====================
 
-    def process_response(self, response_data: Dict) -> tuple[Optional[List], List[List], Optional[List]]:
+    def process_response(self, response_data: Dict,
+                         timings: Optional[Dict] = None) -> tuple[Optional[List], List[List], Optional[List]]:
         """
-        Process API response using custom logic
+        Process API response in a single pass (see decoder.decode_response)
         Returns: (columns, rows, restart_token)
         """
-        data = response_data["results"][0]["result"]["data"]
-        dm0 = data["dsr"]["DS"][0]["PH"][0]["DM0"]
-        columns_types = dm0[0]["S"]
+        return decode_response(response_data, date_format=self.date_format, timings=timings, tz=self.tz,
+                               date_columns=self.date_columns)
 
-        # Extract column names
-        columns = list(map(
-            lambda item: item["GroupKeys"][0]["Source"]["Property"] if item.get("Kind") == 1 else item.get("Value", ""),
-            data["descriptor"]["Select"]
-        ))
+    def get_restart_token(self, response_data: Dict) -> Optional[List]:
+        """Get restart token from RT (Restart Token)"""
+        try:
+            return response_data["results"][0]["result"]["data"]["dsr"]["DS"][0]["RT"][0]
+        except (KeyError, IndexError):
+            return None
 
-        value_dicts = data["dsr"]["DS"][0].get("ValueDicts", {})
+    def get_page_size(self, response_data: Dict) -> int:
+        """Get number of rows in response without processing it"""
+        try:
+            return len(response_data["results"][0]["result"]["data"]["dsr"]["DS"][0]["PH"][0]["DM0"])
+        except (KeyError, IndexError):
+            return 0
 
-        # Apply processing functions
-        self.reconstruct_arrays(columns_types, dm0)
-        self.expand_values(columns_types, dm0, value_dicts)
-        self.replace_newlines_with(dm0, "")
-        self.convert_timestamps_to_dates(dm0)
+    # ==================== MAIN LOOP ====================
 
-        # Extract rows
-        rows = [item["C"] for item in dm0]
+    def fetch_pages(self, pipeline: Pipeline, restart_token: Optional[List], out_queue, decode_workers: int):
+        """
+        Fetch stage: follow restart tokens, put (seq, page, is_last, timings) to queue
+        page is parsed response_data, or StreamedPage in streaming mode
+        Next page is requested as soon as its restart token is known
+        """
+        stats = pipeline.stats["fetch"]
+        prefix = f"[{self.label}] " if self.label else ""
+        seq = 0
+
+        def request(token: Optional[List]):
+            # Open circuit breaker holds every chain of the host
+            delay = self.breaker.delay()
+            while delay > 0:
+                pipeline.sleep(delay)
+                delay = self.breaker.delay()
+            count = self.window.count
+            return token, count, self.transport.submit(self.base_url, self.get_base_payload(token, count), self.stream)
+
+        request_token, requested, pending = request(restart_token)
+        # Retries of current page by failure kind
+        attempts: Dict[str, int] = {}
 
-        # Get restart token from RT (Restart Token)
-        token = None
         try:
-            token = data["dsr"]["DS"][0]["RT"][0]
-        except KeyError:
-            token = None
-
-        return columns, rows, token
+            while True:
+                with stats.measure():
+                    started = time.perf_counter()
+                    try:
+                        response = pipeline.wait(pending)
+                        status, error = response.status_code, f"status {response.status_code}"
+                    except (Stopped, CacheMiss):
+                        raise
+                    except Exception as e:
+                        response, status, error = None, None, str(e) or type(e).__name__
+                    pending = None
+
+                    # Timeouts, 5xx and 429: retry same page after backoff
+                    kind = self.retry.classify(status) if status != 200 else None
+                    if kind:
+                        attempts[kind] = attempts.get(kind, 0) + 1
+                        if not self.retry.allows(kind, attempts[kind]):
+                            raise RuntimeError(f"Page {seq + 1}: {error}, "
+                                               f"giving up after {attempts[kind] - 1} {kind} retries")
+                        retry_after = None
+                        if response is not None:
+                            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        delay = self.retry.delay(attempts[kind], retry_after)
+                        if kind == THROTTLE:
+                            # Throttling applies to the whole host, but the endpoint is not degraded
+                            self.breaker.pause(delay)
+                        else:
+                            self.window.fail(requested)
+                            if self.breaker.failure():
+                                self.metrics.count("breaker_trips")
+                                self.log(f"{prefix}\u26a0\ufe0f Endpoint degraded, "
+                                         f"pausing all requests for {self.breaker.cooldown:g}s")
+                        self.metrics.count("retries")
+                        self.metrics.count(f"retries_{kind}")
+                        self.log(f"{prefix}Page {seq + 1}... \u26a0\ufe0f {error}, retry {attempts[kind]} in {delay:.1f}s "
+                              f"(window {self.window.count})")
+                        if response is not None:
+                            response.close()
+                        pipeline.sleep(delay)
+                        request_token, requested, pending = request(request_token)
+                        continue
+
+                    # Other statuses (4xx) are not retried: raise, so the error carries the status even when silent
+                    if response.status_code != 200:
+                        response.close()
+                        raise RuntimeError(f"Page {seq + 1}: {error}, not retryable")
+                    self.breaker.success()
+                    attempts = {}
+
+                    # Network time if known (not cached), wait: time this stage was blocked on the response
+                    timings = {"wait": time.perf_counter() - started}
+                    if response.elapsed is not None:
+                        timings["network"] = response.elapsed
+                    size = response.size
+
+                    started = time.perf_counter()
+                    if self.stream:
+                        page = StreamedPage(response.open())
+                        token, page_size = page.token, page.size
+                    elif self.decode_pool is not None:
+                        # Only the restart token is read here, the worker process parses the body
+                        page, token = self.submit_decode(response.content)
+                        page_size = None
+                    else:
+                        page = response.json()
+                        token, page_size = self.get_restart_token(page), self.get_page_size(page)
+                    timings["parse"] = time.perf_counter() - started
+
+                    # Short page with restart token: window capped by server, not end of data
+                    # Decode pool: row count is known only once the worker is done, an empty page ends in write stage
+                    is_last_page = token is None or page_size == 0
+                    if page_size is None:
+                        page.add_done_callback(partial(self.record_window, requested, not is_last_page,
+                                                       response.elapsed, size))
+                    else:
+                        self.window.record(requested, page_size, not is_last_page, response.elapsed, size)
+
+                    # Request next page before handing current one over
+                    if not is_last_page:
+                        request_token, requested, pending = request(token)
+
+                timings["bytes"] = size
+                pipeline.put(out_queue, (seq, page, is_last_page, timings))
+                seq += 1
+
+                if is_last_page:
+                    break
+        finally:
+            if pending is not None:
+                pending.cancel()
 
-    # ==================== MAIN LOOP ====================
+        for _ in range(decode_workers):
+            pipeline.put(out_queue, DONE)
 
-    def fetch_all_data(self, delay: float = 1.0, resume: bool = True) -> int:
+    def submit_decode(self, body: bytes) -> tuple[Future, Optional[List]]:
+        """Send raw response body to decode pool, returns (Future of decoder.decode_body result, restart token)"""
+        try:
+            token = scan_restart_token(body)
+        except ValueError:
+            token = self.get_restart_token(json.loads(body))
+        future = self.decode_pool.submit(body, date_format=self.date_format, tz=self.tz, date_columns=self.date_columns)
+        return future, token
+
+    def record_window(self, requested: int, has_more: bool, elapsed: Optional[float], size: int, future: Future):
+        """Adjust window once decode pool worker has counted rows of the page"""
+        if not future.cancelled() and future.exception() is None:
+            self.window.record(requested, future.result()[2], has_more, elapsed, size)
+
+    def decode_pages(self, pipeline: Pipeline, in_queue, out_queue):
         """
-        Fetch all data with pagination and write incrementally to CSV
+        Decode stage: process responses,
+        put (seq, columns, rows, row_count, token, is_last, dictionary_columns, date_columns, timings) to queue
+        In streaming mode rows are a generator, decoded while written
+        With decode pool pages are already being decoded by worker processes, this stage waits for them in order
         """
-        # Load checkpoint
-        restart_token, total_records = self.load_checkpoint() if resume else (None, 0)
-
-        is_resume = total_records > 0
-        csv_mode = 'a' if is_resume else 'w'
+        stats = pipeline.stats["decode"]
+
+        while True:
+            item = pipeline.get(in_queue)
+            if item is DONE:
+                pipeline.put(out_queue, DONE)
+                return
+
+            seq, page, is_last_page, timings = item
+            with stats.measure():
+                columns, rows, row_count, token, dictionary_columns, date_columns = self.decode_page(pipeline, page,
+                                                                                                     timings)
+            pipeline.put(out_queue, (seq, columns, rows, row_count, token, is_last_page, dictionary_columns,
+                                     date_columns, timings))
+
+    def decode_page(self, pipeline: Pipeline, page, timings: Dict) -> tuple:
+        """
+        Decode one page of fetch stage, adds its timings
+        Returns: (columns, rows, row_count, restart_token, dictionary_columns, date_columns);
+        columns is None for empty page
+        """
+        started = time.perf_counter()
+        if self.stream:
+            columns, token, dictionary_columns = page.columns, page.token, page.dictionary_columns
+            date_columns = get_date_columns(page.columns_types, self.date_columns)
+            rows = page.iter_rows(date_format=self.date_format, tz=self.tz, date_columns=self.date_columns)
+            row_count = page.size
+        elif self.decode_pool is not None:
+            columns, rows, row_count, token, dictionary_columns, date_columns, decoded = pipeline.wait(page)
+            # Worker timings, parse also includes the restart token scan of fetch stage
+            decoded["parse"] += timings.pop("parse", 0.0)
+            timings.update(decoded)
+            return columns, rows, row_count, token, dictionary_columns, date_columns
+        elif self.get_page_size(page):
+            columns, rows, token = self.process_response(page, timings)
+            dictionary_columns = get_dictionary_columns(page)
+            date_columns = get_date_columns(get_columns_types(page), self.date_columns)
+            row_count = len(rows)
+        else:
+            columns, rows, row_count, token, dictionary_columns, date_columns = None, [], 0, None, set(), set()
+        timings["decode"] = time.perf_counter() - started
+        return columns, rows, row_count, token, dictionary_columns, date_columns
+
+    def write_pages(self, pipeline: Pipeline, in_queue, sink, decode_workers: int):
+        """Write stage: write pages to sink in page order and commit checkpoints"""
+        stats = pipeline.stats["write"]
+        prefix = f"[{self.label}] " if self.label else ""
+
+        decoded = {}
+        next_seq = 0
+        finished_workers = 0
+
+        while finished_workers < decode_workers:
+            item = pipeline.get(in_queue)
+            if item is DONE:
+                finished_workers += 1
+                continue
+
+            # Decode workers may finish pages out of order
+            decoded[item[0]] = item
+            while next_seq in decoded:
+                (_, columns, rows, row_count, token, is_last_page, dictionary_columns, date_columns,
+                 timings) = decoded.pop(next_seq)
+                next_seq += 1
+
+                if columns is None or not row_count:
+                    print(f"{prefix}Page {next_seq}... End of data")
+                    self.journal.append(sink, None, self.total_records, done=True)
+                    self.completed = True
+                    return
+
+                with stats.measure():
+                    started = time.perf_counter()
+                    try:
+                        sink.write_page(columns, rows, dictionary_columns, date_columns)
+                        sink.flush()
+                    except BaseException:
+                        # Output may end with a partial page: don't commit its current size
+                        self.journal.discard()
+                        sink.discard()
+                        raise
+                    written = time.perf_counter()
 
-        print(f"Mode: {'Resume' if is_resume else 'New'}")
-        print(f"File: {self.output_csv}")
-        print("-" * 60)
+                    self.total_records += row_count
 
-        # Open CSV file
-        csv_file = open(self.output_csv, csv_mode, newline='', encoding='utf-8')
-        writer = None
-        seen_permits = set()  # Duplicate protection
+                    # Journal page, fsync output and journal once per group
+                    self.journal.append(sink, token, self.total_records, done=is_last_page)
+                    timings["write"] = written - started
+                    timings["checkpoint"] = time.perf_counter() - written
 
-        page = 1
+                self.metrics.page(self.label, next_seq, row_count, timings.pop("bytes"), timings)
 
-        try:
-            while True:
-                print(f"Page {page}... ", end='', flush=True)
-
-                # Make request
-                payload = self.get_base_payload(restart_token)
-                response = self.session.post(
-                    self.base_url,
-                    json=payload,
-                    timeout=30
-                )
-
-                if response.status_code != 200:
-                    print(f"\u274c Error: {response.status_code}")
-                    break
+                print(f"{prefix}Page {next_seq}... {row_count} records (Total: {self.total_records})")
 
-                response_data = response.json()
-                columns, rows, token = self.process_response(response_data)
+                # Last page?
+                if is_last_page:
+                    print(f"{prefix}\u2705 Last page!")
+                    self.completed = True
+                    return
 
-                if columns is None or not rows:
-                    print("End of data")
-                    break
+    def iter_batches(self, state: Optional[ScrapeState] = None, queue_size: int = 8) -> Iterator[RecordBatch]:
+        """
+        Fetch and decode pages in-process, one RecordBatch per page; no output file or checkpoint file is used
+        Every batch carries the state after it: pass the state of the last consumed batch to resume
+        The last batch has state.done set (it is empty if the data ended with an empty page)
+        Raises the fetch error if the chain stops before the last page
+        """
+        state = state or ScrapeState()
+        if state.done:
+            return
 
-                # Initialize writer on first page
-                if writer is None:
-                    writer = csv.writer(csv_file)
-                    # Write header only for new file
-                    if not is_resume:
-                        writer.writerow(columns)
+        pipeline = Pipeline(self.stop_event, queue_size=queue_size, profiler=self.metrics.profiler)
+        pipeline.stage("fetch")
+        raw_pages = pipeline.queue()
+        records = state.records
 
-                # Write rows with duplicate check
-                written = 0
-                for row in rows:
-                    writer.writerow(row)
-                    written += 1
+        try:
+            pipeline.start(f"{self.label or 'batches'}-fetch", self.fetch_pages, pipeline, state.token, raw_pages, 1)
+            while True:
+                item = pipeline.get(raw_pages)
+                if item is DONE:
+                    raise RuntimeError(f"Fetch stopped before the last page after {records} records")
+
+                seq, page, is_last_page, timings = item
+                columns, rows, row_count, token, dictionary_columns, _ = self.decode_page(pipeline, page, timings)
+                if columns is None or not row_count:
+                    yield RecordBatch(columns or [], [], ScrapeState(None, records, done=True))
+                    return
+
+                records += row_count
+                self.metrics.page(self.label, seq + 1, row_count, timings.pop("bytes"), timings)
+                yield RecordBatch(columns, rows if isinstance(rows, list) else list(rows),
+                                  ScrapeState(token, records, done=is_last_page), dictionary_columns)
+                if is_last_page:
+                    return
+        except Stopped:
+            if pipeline.errors:
+                raise pipeline.errors[0]
+        finally:
+            pipeline.stop()
+            pipeline.join()
 
-                csv_file.flush()  # Save to disk immediately
+    def fetch_all_data(self, resume: bool = True, decode_workers: int = 1, queue_size: int = 8) -> int:
+        """
+        Fetch all data with pagination and write incrementally to CSV
+        Runs as a pipeline: fetch -> decode -> write, connected by bounded queues
+        """
+        if self.sink_class is None:
+            raise ValueError("Writing output requires output_format, use iter_batches() without it")
+        # Load checkpoint
+        if resume:
+            restart_token, self.total_records = self.load_checkpoint()
+        else:
+            restart_token, self.total_records = None, 0
+            self.journal.open()
+
+        is_resume = self.total_records > 0
+        prefix = f"[{self.label}] " if self.label else ""
+
+        if self.completed:
+            print(f"{prefix}\u2713 Already completed: {self.total_records} records")
+            self.journal.close(None)
+            return self.total_records
+
+        print(f"{prefix}Mode: {'Resume' if is_resume else 'New'}")
+        print(f"{prefix}File: {self.output_csv}")
+        print("-" * 60)
 
-                total_records += written
-                print(f"{written} records (Total: {total_records})")
+        # Open output file
+        sink = self.sink_class(self.output_csv, append=is_resume)
 
-                # Save checkpoint
-                self.save_checkpoint(token, total_records)
+        pipeline = Pipeline(self.stop_event, queue_size=queue_size, profiler=self.metrics.profiler)
+        pipeline.stage("fetch")
+        pipeline.stage("decode", workers=decode_workers)
+        pipeline.stage("write")
+        raw_pages = pipeline.queue()
+        decoded_pages = pipeline.queue()
 
-                # Last page?
-                if len(rows) < 500:
-                    print("\u2705 Last page!")
-                    break
+        try:
+            pipeline.start(f"{prefix}fetch", self.fetch_pages, pipeline, restart_token, raw_pages, decode_workers)
+            for i in range(decode_workers):
+                pipeline.start(f"{prefix}decode-{i}", self.decode_pages, pipeline, raw_pages, decoded_pages)
 
-                restart_token = token
-                page += 1
-                time.sleep(delay)
+            write = self.metrics.profiler.wrap(self.write_pages) if self.metrics.profiler else self.write_pages
+            write(pipeline, decoded_pages, sink, decode_workers)
 
+        except Stopped:
+            pass
         except KeyboardInterrupt:
-            print("\
-\
-\u26a0\ufe0f  Interrupted by user")
-            print(f"Checkpoint saved: {total_records} records")
+            print("\n\n\u26a0\ufe0f  Interrupted by user")
+            print(f"{prefix}Checkpoint saved: {self.total_records} records")
         except Exception as e:
-            print(f"\
-\u274c Error: {e}")
+            print(f"\n{prefix}\u274c Error: {e}")
             import traceback
             traceback.print_exc()
         finally:
-            csv_file.close()
+            pipeline.stop()
+            pipeline.join()
+            try:
+                self.journal.close(sink)
+            finally:
+                sink.close()
+
+        for e in pipeline.errors:
+            print(f"\n{prefix}\u274c Error: {e}")
+            import traceback
+            traceback.print_exception(type(e), e, e.__traceback__)
 
         print("-" * 60)
-        print(f"\u2713 Completed: {total_records} records")
-        print(f"\u2713 File: {self.output_csv}")
+        pipeline.print_stats()
+        print(f"{prefix}\u2713 Completed: {self.total_records} records")
+        print(f"{prefix}\u2713 File: {self.output_csv}")
+
+        return self.total_records
+
+    # ==================== PARTITIONED MODE ====================
+
+    def partition_files(self, name: str) -> tuple[str, str]:
+        """Get (output, checkpoint) file names for partition"""
+        root, ext = os.path.splitext(self.checkpoint_file)
+        return f"{self.output_csv}.{name}.part", f"{root}.{name}{ext}"
+
+    def child(self, name: str, extra_where: List[Dict]) -> "PowerBIParserFinal":
+        """Parser of one partition: same settings, own output and checkpoint, extra Where conditions"""
+        output, checkpoint = self.partition_files(name)
+        return PowerBIParserFinal(
+            output_csv=output,
+            checkpoint_file=checkpoint,
+            extra_where=self.extra_where + extra_where,
+            label=name,
+            stop_event=self.stop_event,
+            transport=self.transport,
+            output_format=self.output_format,
+            stream=self.stream,
+            window=self.window,
+            commit_every=self.commit_every,
+            commit_interval=self.commit_interval,
+            report=self.report,
+            metrics=self.metrics,
+            tz=self.tz,
+            date_format=self.date_format,
+            retry=self.retry,
+            breaker=self.breaker,
+            decode_pool=self.decode_pool,
+            log=self.log
+        )
+
+    def fetch_partitioned(self, partitions: List[Dict], resume: bool = True, workers: Optional[int] = None,
+                          decode_workers: int = 1, queue_size: int = 8) -> int:
+        """
+        Fetch disjoint partitions as independent RestartToken chains in parallel,
+        then merge partition outputs into the single ordered CSV
+        """
+        ordered = all(partition.get("ordered") for partition in partitions)
+        if not ordered and not self.sink_class.mergeable:
+            raise ValueError(f"{self.output_format} output supports only ordered (Account Number range) partitions")
+
+        print(f"Partitions: {len(partitions)} (workers: {workers or len(partitions)})")
+
+        children = [self.child(partition["name"], partition["where"]) for partition in partitions]
+
+        with ThreadPoolExecutor(max_workers=workers or len(partitions)) as executor:
+            futures = [executor.submit(child.fetch_all_data, resume, decode_workers, queue_size) for child in children]
+            try:
+                totals = [future.result() for future in futures]
+            except KeyboardInterrupt:
+                print("\n\n\u26a0\ufe0f  Interrupted by user, stopping partitions...")
+                self.stop_event.set()
+                totals = [future.result() for future in futures]
+
+        if not all(child.completed for child in children):
+            print("\u26a0\ufe0f Not all partitions completed, run again to resume")
+            return sum(totals)
+
+        total_records = self.merge_partitions([child.output_csv for child in children], ordered)
+        self.completed = True
+
+        for child in children:
+            for f in [child.output_csv, child.checkpoint_file]:
+                if os.path.exists(f):
+                    os.remove(f)
 
         return total_records
 
+    def merge_partitions(self, part_files: List[str], ordered: bool) -> int:
+        """
+        Merge partition files into output file
+        - ordered: partitions are consecutive ranges, concatenate as is
+        - otherwise: k-way merge by Account Number (first column)
+        Columnar sinks create no file for a partition without rows, such partitions are skipped
+        """
+        part_files = [part_file for part_file in part_files if os.path.exists(part_file)]
+        sink = self.sink_class(self.output_csv)
+        total_records = 0
+        try:
+            if ordered:
+                for part_file in part_files:
+                    total_records += sink.append_file(part_file)
+            else:
+                pages = [sink.read_pages(part_file) for part_file in part_files]
+                columns = None
+                readers = []
+                for part_pages in pages:
+                    first = next(part_pages, None)
+                    if first is not None:
+                        columns = first[0]
+                        readers.append(self.chain_rows(first[1], part_pages))
+
+                rows = []
+                for row in heapq.merge(*readers, key=lambda row: row[0]):
+                    rows.append(row)
+                    if len(rows) == 500:
+                        sink.write_page(columns, rows)
+                        total_records += len(rows)
+                        rows = []
+                if rows:
+                    sink.write_page(columns, rows)
+                    total_records += len(rows)
+        finally:
+            sink.close()
+
+        print(f"\u2713 Merged {len(part_files)} partitions: {total_records} records")
+        return total_records
+
+    @staticmethod
+    def chain_rows(first_rows: List[List], pages):
+        """Iterate rows of already read first page and remaining pages"""
+        yield from first_rows
+        for _, rows in pages:
+            yield from rows
+
+    # ==================== SYNC MODE ====================
+
+    def fetch_sync_accounts(self, fetched_file: str, resume: bool = True, decode_workers: int = 1,
+                            queue_size: int = 8) -> Optional[str]:
+        """
+        Fetch all rows of the accounts in fetched_file, by Account Number "In" lists
+        The date filter matches single Permit Transaction rows, while the snapshot keeps all rows of an account
+        Returns output file, None if fetch is not completed
+        """
+        _, groups = read_groups(fetched_file)
+        keys = [key for key, _ in groups]
+        if not keys:
+            return fetched_file
+        print(f"Sync: fetching all rows of {len(keys)} changed permits")
+        accounts = self.child("sync-accounts", [])
+        accounts.fetch_partitioned(account_partitions(keys), resume, decode_workers=decode_workers,
+                                   queue_size=queue_size)
+        return accounts.output_csv if accounts.completed else None
+
+    def sync(self, index_file: str, changes_file: str, full: bool = False, resume: bool = True,
+             decode_workers: int = 1, queue_size: int = 8) -> Optional[Dict[str, int]]:
+        """
+        Incremental sync of output snapshot:
+        - with previous sync: find permits with Submitted / Issue / End Date since last sync,
+          then fetch all rows of these permits
+        - first sync or full=True: fetch everything, also detects removed permits
+        Changes are appended to changes_file, index keeps Account Number -> row hash
+        """
+        if self.output_format != "csv":
+            raise ValueError("Sync mode supports only csv output")
+
+        index = SyncIndex(index_file)
+        index.load()
+
+        sync_time = datetime.now()
+        narrowed = not full and index.last_sync is not None and os.path.exists(self.output_csv)
+        extra_where = []
+        if narrowed:
+            # One day margin for timezone differences
+            since = index.last_sync - timedelta(days=1)
+            extra_where.append(date_since_condition(since))
+            print(f"Sync: changes since {since.date()}")
+        else:
+            print("Sync: full")
+
+        child = self.child("sync", extra_where)
+        child.fetch_all_data(resume, decode_workers, queue_size)
+
+        if not child.completed:
+            print("\u26a0\ufe0f Sync fetch not completed, run again to resume")
+            return None
+
+        if narrowed:
+            accounts_file = self.fetch_sync_accounts(child.output_csv, resume, decode_workers, queue_size)
+            if accounts_file is None:
+                print("\u26a0\ufe0f Sync fetch not completed, run again to resume")
+                return None
+            counts = apply_narrowed_sync(index, accounts_file, self.output_csv, changes_file, sync_time)
+            if os.path.exists(child.output_csv):
+                os.remove(child.output_csv)
+        else:
+            counts = apply_full_sync(index, child.output_csv, self.output_csv, changes_file, sync_time)
+        index.save()
+        if os.path.exists(child.checkpoint_file):
+            os.remove(child.checkpoint_file)
+
+        print(f"\u2713 Sync: {counts['inserted']} inserted, {counts['changed']} changed, "
+              f"{counts['removed']} removed")
+        print(f"\u2713 Changes: {changes_file}")
+        return counts
+
+
+def fetch_reports(parsers: List[PowerBIParserFinal], resume: bool = True, workers: Optional[int] = None,
+                  decode_workers: int = 1, queue_size: int = 8) -> int:
+    """
+    Fetch several reports concurrently, one RestartToken chain each
+    Parsers share stop event, reports on the same host share its rate limiter
+    """
+    print(f"Reports: {len(parsers)} (workers: {workers or len(parsers)})")
+
+    with ThreadPoolExecutor(max_workers=workers or len(parsers)) as executor:
+        futures = [executor.submit(p.fetch_all_data, resume, decode_workers, queue_size) for p in parsers]
+        try:
+            totals = [future.result() for future in futures]
+        except KeyboardInterrupt:
+            print("\n\n\u26a0\ufe0f  Interrupted by user, stopping reports...")
+            parsers[0].stop_event.set()
+            totals = [future.result() for future in futures]
+
+    if not all(p.completed for p in parsers):
+        print("\u26a0\ufe0f Not all reports completed, run again to resume")
+    return sum(totals)
+
 
 def main():
     import argparse
 
     parser = argparse.ArgumentParser(description='PowerBI Parser with checkpoint support')
-    parser.add_argument('--output', default='result.csv', help='Output CSV file')
+    parser.add_argument('--report', action='append',
+                        help='Report spec (.json/.yaml), repeat to scrape several reports (default: reports/ohio_permits.json)')
+    parser.add_argument('--output', help='Output file (default: result.<format extension>)')
+    parser.add_argument('--format', choices=list(SINKS), default='csv', help='Output format')
     parser.add_argument('--checkpoint', default='checkpoint.json', help='Checkpoint file')
-    parser.add_argument('--delay', type=float, default=1.0, help='Delay between requests (seconds)')
+    parser.add_argument('--delay', type=float, default=1.0, help='Delay between requests (seconds), if --rps not set')
+    parser.add_argument('--rps', type=float, help='Requests per second limit (shared by all partitions)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Max requests in flight')
+    parser.add_argument('--pool-size', type=int, default=4, help='Max open connections')
+    parser.add_argument('--backend', choices=['requests', 'async'], default='requests',
+                        help='HTTP backend (async requires httpx)')
+    parser.add_argument('--timeout', type=float, default=30, help='Request timeout (seconds)')
+    parser.add_argument('--retry-timeouts', type=int, default=5, help='Retries of a page after timeouts and connection errors')
+    parser.add_argument('--retry-server', type=int, default=5, help='Retries of a page after 5xx responses')
+    parser.add_argument('--retry-throttle', type=int, default=10, help='Retries of a page after 429 responses')
+    parser.add_argument('--backoff', type=float, default=1.0, help='Initial retry delay (seconds), doubled on every retry')
+    parser.add_argument('--backoff-max', type=float, default=60.0, help='Max retry delay (seconds)')
+    parser.add_argument('--breaker-threshold', type=int, default=5,
+                        help='Consecutive failures that pause all requests to the host (0 - never)')
+    parser.add_argument('--breaker-cooldown', type=float, default=30.0, help='Pause after breaker opens (seconds)')
+    parser.add_argument('--decode-workers', type=int, default=1, help='Decode stage workers (threads or processes)')
+    parser.add_argument('--decode-pool', choices=['thread', 'process'], default='thread',
+                        help='Decode in threads, or in worker processes shared by all chains')
+    parser.add_argument('--queue-size', type=int, default=8, help='Max pages buffered between stages')
+    parser.add_argument('--window', type=int, default=500, help='Rows per request (initial size if adaptive)')
+    parser.add_argument('--window-min', type=int, default=100, help='Min rows per request (adaptive)')
+    parser.add_argument('--window-max', type=int, default=30000, help='Max rows per request (adaptive)')
+    parser.add_argument('--latency-budget', type=float, help='Adapt window to keep requests under N seconds')
+    parser.add_argument('--size-budget', type=float, help='Adapt window to keep responses under N MB')
+    parser.add_argument('--stream', action='store_true', help='Stream-parse responses to keep memory flat (needs ijson)')
+    parser.add_argument('--cache', help='Response cache directory')
+    parser.add_argument('--cache-size', type=float, default=1024, help='Max cache size (MB)')
+    parser.add_argument('--cache-ttl', type=float, help='Cached responses expire after (hours)')
+    parser.add_argument('--replay', action='store_true', help='Process cached responses only, no network')
+    parser.add_argument('--tz', default=DEFAULT_TZ,
+                        help='Timezone of converted dates: IANA name, UTC or "local" (host timezone, old behavior)')
+    parser.add_argument('--date-format', default=DATE_FORMAT, help='strftime format of dates in text outputs')
+    parser.add_argument('--commit-every', type=int, default=10, help='Commit checkpoint every N pages')
+    parser.add_argument('--commit-interval', type=float, default=5.0, help='Commit checkpoint at least every N seconds')
+    parser.add_argument('--metrics', help='Write per-page timings and run summary as JSON lines')
+    parser.add_argument('--metrics-prom', help='Write run metrics as Prometheus text file')
+    parser.add_argument('--metrics-history', help='Append run summary to JSON lines file and compare with previous run')
+    parser.add_argument('--profile', help='Profile all pipeline threads, write result to file')
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile',
+                        help='Profiler for --profile (pyinstrument requires pyinstrument)')
     parser.add_argument('--fresh', action='store_true', help='Start from scratch')
+    parser.add_argument('--sync', action='store_true', help='Incremental sync of existing output')
+    parser.add_argument('--sync-full', action='store_true', help='Sync with full fetch (detects removed permits)')
+    parser.add_argument('--sync-index', default='sync_index.json', help='Sync index file')
+    parser.add_argument('--changes', help='Change log CSV (default: <output>.changes.csv)')
+    parser.add_argument('--partition-bounds', help='Comma-separated Account Number bounds, e.g. "2000,4000,6000"')
+    parser.add_argument('--partition-counties', help='County groups: "Franklin,Delaware;Cuyahoga" (+ rest)')
+    parser.add_argument('--workers', type=int, help='Parallel partition or report chains (default: one per partition/report)')
 
     args = parser.parse_args()
+    if args.replay and not args.cache:
+        parser.error("--replay requires --cache")
+    if args.decode_pool == 'process' and args.stream:
+        parser.error("--decode-pool process doesn't support --stream")
+    try:
+        get_timezone(args.tz)
+    except (ValueError, KeyError) as e:
+        parser.error(f"Unknown timezone {args.tz}: {e}")
+
+    try:
+        reports = [ReportSpec.load(path) for path in args.report or [DEFAULT_REPORT]]
+    except (OSError, ValueError, RuntimeError) as e:
+        parser.error(f"Can't load report spec: {e}")
+    extension = SINKS[args.format].extension
+    if len(reports) > 1:
+        if args.output or args.sync or args.sync_full or args.partition_bounds or args.partition_counties:
+            parser.error("several --report specs support neither --output, --sync nor partitions")
+        if len({report.name for report in reports}) < len(reports):
+            parser.error("report spec names must be unique")
+        root, ext = os.path.splitext(args.checkpoint)
+        targets = [(report.output or report.name + extension, f"{root}.{report.name}{ext}") for report in reports]
+    else:
+        args.output = args.output or reports[0].output or "result" + extension
+        targets = [(args.output, args.checkpoint)]
+
+    partitions = None
+    if args.partition_bounds:
+        partitions = account_range_partitions([b.strip() for b in args.partition_bounds.split(',') if b.strip()])
+    elif args.partition_counties:
+        partitions = county_partitions([[c.strip() for c in group.split(',') if c.strip()]
+                                        for group in args.partition_counties.split(';') if group.strip()])
 
     # If fresh - remove old files
     if args.fresh:
-        for f in [args.checkpoint, args.output]:
-            if os.path.exists(f):
-                os.remove(f)
-                print(f"\ud83d\uddd1\ufe0f  Removed: {f}")
+        import glob
+        for output, checkpoint in targets:
+            root, ext = os.path.splitext(checkpoint)
+            for f in [checkpoint, output] + glob.glob(f"{output}.*.part") + glob.glob(f"{root}.p*{ext}") + glob.glob(f"{root}.sync*{ext}"):
+                if os.path.exists(f):
+                    os.remove(f)
+                    print(f"\ud83d\uddd1\ufe0f  Removed: {f}")
 
     print("=" * 60)
     print("PowerBI Parser - Final Version")
     print("=" * 60)
 
-    parser_obj = PowerBIParserFinal(
-        output_csv=args.output,
-        checkpoint_file=args.checkpoint
-    )
+    cache = None
+    if args.cache:
+        cache = ResponseCache(args.cache, max_bytes=int(args.cache_size * 1024 * 1024),
+                              ttl=args.cache_ttl * 3600 if args.cache_ttl else None)
+
+    try:
+        profiler = Profiler(args.profile, args.profiler) if args.profile else None
+    except RuntimeError as e:
+        parser.error(str(e))
+    metrics = Metrics(args.metrics, profiler=profiler)
+    decode_pool = DecodePool(args.decode_workers) if args.decode_pool == 'process' else None
+
+    rps = args.rps if args.rps else (1 / args.delay if args.delay > 0 else None)
+    limiters = HostRateLimiters(rps=rps, concurrency=args.concurrency)
+    retry = RetryPolicy(timeouts=args.retry_timeouts, server=args.retry_server, throttle=args.retry_throttle,
+                        base=args.backoff, max_delay=args.backoff_max)
+    breakers = HostBreakers(threshold=args.breaker_threshold, cooldown=args.breaker_cooldown)
+    stop_event = threading.Event()
+    parsers = [PowerBIParserFinal(
+        output_csv=output,
+        checkpoint_file=checkpoint,
+        label=report.name if len(reports) > 1 else "",
+        stop_event=stop_event,
+        backend=args.backend,
+        limiter=limiters.get(report.url),
+        pool_size=args.pool_size,
+        output_format=args.format,
+        cache=cache,
+        replay=args.replay,
+        stream=args.stream,
+        window=PageWindow(args.window, min_count=args.window_min, max_count=args.window_max,
+                          latency_budget=args.latency_budget,
+                          size_budget=int(args.size_budget * 1024 * 1024) if args.size_budget else None),
+        commit_every=args.commit_every,
+        commit_interval=args.commit_interval,
+        report=report,
+        metrics=metrics,
+        tz=args.tz,
+        date_format=args.date_format,
+        retry=retry,
+        breaker=breakers.get(report.url),
+        timeout=args.timeout,
+        decode_pool=decode_pool
+    ) for report, (output, checkpoint) in zip(reports, targets)]
+    parser_obj = parsers[0]
 
     start_time = time.time()
-    total = parser_obj.fetch_all_data(delay=args.delay, resume=not args.fresh)
+    try:
+        if len(parsers) > 1:
+            total = fetch_reports(parsers, resume=not args.fresh, workers=args.workers,
+                                  decode_workers=args.decode_workers, queue_size=args.queue_size)
+        elif args.sync or args.sync_full:
+            counts = parser_obj.sync(args.sync_index, args.changes or os.path.splitext(args.output)[0] + ".changes.csv",
+                                     full=args.sync_full, resume=not args.fresh,
+                                     decode_workers=args.decode_workers, queue_size=args.queue_size)
+            total = sum(counts.values()) if counts else 0
+        elif partitions:
+            total = parser_obj.fetch_partitioned(partitions, resume=not args.fresh, workers=args.workers,
+                                                 decode_workers=args.decode_workers, queue_size=args.queue_size)
+        else:
+            total = parser_obj.fetch_all_data(resume=not args.fresh, decode_workers=args.decode_workers,
+                                              queue_size=args.queue_size)
+    finally:
+        for p in parsers:
+            p.transport.close()
+        if decode_pool is not None:
+            decode_pool.close()
+        metrics.close()
     elapsed = time.time() - start_time
 
+    print()
+    metrics.print_summary()
+    summary = metrics.summary()
+    summary["reports"] = [report.name for report in reports]
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+    if args.metrics_history:
+        previous = append_history(args.metrics_history, summary)
+        if previous:
+            print_comparison(summary, previous)
+    if profiler is not None:
+        profiler.save()
+
     print("\
 " + "=" * 60)
     print(f"\u2705 COMPLETED")
     print(f"\ud83d\udcca Total records: {total}")
     print(f"\u23f1\ufe0f  Time: {elapsed:.1f} sec ({elapsed / 60:.1f} min)")
-    print(f"\ud83d\udcc1 File: {args.output}")
+    for p in parsers:
+        print(f"\ud83d\udcc1 File: {p.output_csv}")
+        if p.window.adaptive:
+            print(f"\ud83d\udccf Window: {p.window.count} rows (max {p.window.max_count})")
+    if cache is not None:
+        print(f"\ud83d\uddc4\ufe0f  Cache: {cache.hits} hits, {cache.misses} misses, {cache.size / 1024 / 1024:.1f} MB")
     print("=" * 60)
 
 
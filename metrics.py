@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+# Per-page timings, in pipeline order
+TIMINGS = ["wait", "network", "parse", "decode", "decode_dicts", "decode_rows", "write", "checkpoint"]
+QUANTILES = [0.5, 0.9, 0.99]
+# Run counters, retries are also counted per failure kind (see retry.py)
+COUNTERS = ["pages", "rows", "bytes", "retries", "retries_timeout", "retries_server", "retries_throttle",
+            "breaker_trips"]
+
+
+class Histogram:
+    """Latency samples (seconds) of one timing, percentiles are exact"""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.sum += value
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> Dict:
+        result = {"count": len(self.samples), "sum": round(self.sum, 6)}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = round(self.percentile(q), 6)
+        result["max"] = round(max(self.samples, default=0.0), 6)
+        return result
+
+
+class Metrics:
+    """
+    Counters and per-page timings of a run, shared by all chains (partitions, reports)
+    - page(): one record per written page, also appended to pages_file as JSON line
+    - summary(): totals, rows/s, bytes/s and percentiles of every timing
+    Timings of a page are collected in a dict that travels with the page through the pipeline
+    """
+
+    def __init__(self, pages_file: Optional[str] = None, profiler: Optional["Profiler"] = None):
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.profiler = profiler
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.file = open(pages_file, 'w', encoding='utf-8') if pages_file else None
+
+    def count(self, name: str, value: float = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def page(self, label: str, seq: int, rows: int, size: int, timings: Dict[str, float]):
+        """Record written page"""
+        with self.lock:
+            for name in ("pages", "rows", "bytes"):
+                self.counters.setdefault(name, 0)
+            self.counters["pages"] += 1
+            self.counters["rows"] += rows
+            self.counters["bytes"] += size
+            for name, value in timings.items():
+                self.histograms.setdefault(name, Histogram()).add(value)
+            if self.file is not None:
+                record = {"label": label, "page": seq, "rows": rows, "bytes": size,
+                          **{name: round(value, 6) for name, value in timings.items()}}
+                self.file.write(json.dumps(record) + "\n")
+                self.file.flush()
+
+    def summary(self) -> Dict:
+        with self.lock:
+            wall = time.perf_counter() - self.started
+            counters = dict(self.counters)
+            timings = {name: self.histograms[name].summary()
+                       for name in sorted(self.histograms, key=lambda n: TIMINGS.index(n) if n in TIMINGS else 99)}
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "wall": round(wall, 3),
+            **counters,
+            "rows_per_sec": round(counters.get("rows", 0) / wall, 1) if wall > 0 else 0,
+            "bytes_per_sec": round(counters.get("bytes", 0) / wall, 1) if wall > 0 else 0,
+            "timings": timings,
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"Throughput: {summary['rows_per_sec']:.0f} rows/s, {summary['bytes_per_sec'] / 1024:.0f} KB/s, "
+              f"{summary.get('retries', 0):.0f} retries")
+        if summary.get('retries'):
+            print(f"Retries: {summary.get('retries_timeout', 0):.0f} timeouts, {summary.get('retries_server', 0):.0f} "
+                  f"server errors, {summary.get('retries_throttle', 0):.0f} throttled, "
+                  f"{summary.get('breaker_trips', 0):.0f} circuit breaker trips")
+        print("Page timings (ms):        p50      p90      p99      max      total")
+        for name, t in summary["timings"].items():
+            print(f"  {name:<14} {t['p50'] * 1000:9.1f}{t['p90'] * 1000:9.1f}{t['p99'] * 1000:9.1f}"
+                  f"{t['max'] * 1000:9.1f}{t['sum']:10.1f}s")
+
+    def write_prometheus(self, path: str, prefix: str = "powerbi_scraper"):
+        """Write Prometheus text file (summaries with quantiles), replaced atomically"""
+        summary = self.summary()
+        lines = []
+        for name in COUNTERS:
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {summary.get(name, 0)}")
+        lines.append(f"# TYPE {prefix}_wall_seconds gauge")
+        lines.append(f"{prefix}_wall_seconds {summary['wall']}")
+        lines.append(f"# TYPE {prefix}_page_seconds summary")
+        for name, t in summary["timings"].items():
+            for q in QUANTILES:
+                lines.append(f'{prefix}_page_seconds{{timing="{name}",quantile="{q}"}} {t[f"p{int(q * 100)}"]}')
+            lines.append(f'{prefix}_page_seconds_sum{{timing="{name}"}} {t["sum"]}')
+            lines.append(f'{prefix}_page_seconds_count{{timing="{name}"}} {t["count"]}')
+
+        temp = path + ".tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp, path)
+
+    def close(self):
+        """Append run summary to pages file"""
+        if self.file is not None:
+            self.file.write(json.dumps({"summary": self.summary()}) + "\n")
+            self.file.close()
+            self.file = None
+
+
+def append_history(path: str, summary: Dict) -> Optional[Dict]:
+    """Append run summary to history (JSON lines), returns previous run summary"""
+    previous = None
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    previous = json.loads(line)
+                except ValueError:
+                    continue
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    return previous
+
+
+def print_comparison(summary: Dict, previous: Dict):
+    """Print change of throughput and median timings since previous run"""
+
+    def change(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+    print(f"Compared to run of {previous.get('timestamp', '?')}:")
+    print(f"  rows/s   {summary['rows_per_sec']:.0f} vs {previous.get('rows_per_sec', 0):.0f} "
+          f"({change(summary['rows_per_sec'], previous.get('rows_per_sec', 0))})")
+    for name, t in summary["timings"].items():
+        old = previous.get("timings", {}).get(name)
+        if old:
+            print(f"  {name:<12} p50 {t['p50'] * 1000:.1f} vs {old['p50'] * 1000:.1f} ms ({change(t['p50'], old['p50'])})")
+
+
+class Profiler:
+    """
+    Profiles every pipeline thread separately, merged on save:
+    - cprofile: pstats file, top functions printed
+    - pyinstrument (optional dependency): text report, or HTML if path ends with .html
+    """
+
+    def __init__(self, path: str, mode: str = "cprofile"):
+        if mode == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise RuntimeError("pyinstrument profiler requires pyinstrument: pip install pyinstrument")
+        elif mode != "cprofile":
+            raise ValueError(f"Unknown profiler: {mode} (available: cprofile, pyinstrument)")
+        self.path = path
+        self.mode = mode
+        self.results = []
+        self.lock = threading.Lock()
+
+    def wrap(self, target: Callable) -> Callable:
+        """Run target under profiler of the calling thread"""
+
+        def run(*args, **kwargs):
+            if self.mode == "cprofile":
+                import cProfile
+                profile = cProfile.Profile()
+                profile.enable()
+            else:
+                from pyinstrument import Profiler as Sampler
+                profile = Sampler()
+                profile.start()
+            try:
+                return target(*args, **kwargs)
+            finally:
+                if self.mode == "cprofile":
+                    profile.disable()
+                    result = profile
+                else:
+                    result = profile.stop()
+                with self.lock:
+                    self.results.append(result)
+
+        return run
+
+    def save(self):
+        if not self.results:
+            return
+        if self.mode == "cprofile":
+            import pstats
+            stats = pstats.Stats(self.results[0])
+            for profile in self.results[1:]:
+                stats.add(profile)
+            stats.dump_stats(self.path)
+            stats.sort_stats("cumulative").print_stats(15)
+        else:
+            from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer
+            session = self.results[0]
+            for other in self.results[1:]:
+                session = session.combine(session, other)
+            if self.path.endswith(".html"):
+                output = HTMLRenderer().render(session)
+            else:
+                output = ConsoleRenderer(unicode=True, color=False, show_all=False).render(session)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(output)
+        print(f"Profile saved: {self.path}")
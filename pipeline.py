@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from contextlib import contextmanager
+from queue import Empty, Full, Queue
+from typing import Callable, List, Optional
+
+
+# Marks end of stream in a queue
+DONE = object()
+
+
+class Stopped(Exception):
+    """Raised inside a stage when pipeline is shutting down"""
+
+
+class StageStats:
+    """Busy time and item count of one pipeline stage"""
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.items = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def measure(self):
+        """Count time spent inside block as busy"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.busy += time.perf_counter() - start
+                self.items += 1
+
+
+class Pipeline:
+    """
+    Stages running in threads, connected by bounded queues:
+    - full queue blocks the producer (backpressure)
+    - stop() or any stage error wakes up all stages
+    Stage workers run under profiler (metrics.Profiler) if given
+    """
+
+    def __init__(self, stop_event: Optional[threading.Event] = None, queue_size: int = 8, profiler=None):
+        self.parent_stop = stop_event or threading.Event()
+        self.profiler = profiler
+        self.stopped = threading.Event()
+        self.queue_size = queue_size
+        self.threads: List[threading.Thread] = []
+        self.stats: dict = {}
+        self.errors: List[BaseException] = []
+        self.started = time.perf_counter()
+
+    def is_stopped(self) -> bool:
+        return self.stopped.is_set() or self.parent_stop.is_set()
+
+    def stop(self):
+        self.stopped.set()
+
+    def queue(self) -> Queue:
+        return Queue(maxsize=self.queue_size)
+
+    def stage(self, name: str, workers: int = 1) -> StageStats:
+        """Create stats for stage, shared by all its workers"""
+        self.stats[name] = StageStats(name, workers)
+        return self.stats[name]
+
+    def put(self, q: Queue, item):
+        """Put item, waiting for free space until pipeline stops"""
+        while True:
+            if self.is_stopped():
+                raise Stopped()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def get(self, q: Queue):
+        """Get item, waiting until pipeline stops"""
+        while True:
+            if self.is_stopped():
+                raise Stopped()
+            try:
+                return q.get(timeout=0.1)
+            except Empty:
+                pass
+
+    def wait(self, future: Future):
+        """Wait for future result until pipeline stops"""
+        while True:
+            if self.is_stopped():
+                future.cancel()
+                raise Stopped()
+            try:
+                return future.result(timeout=0.1)
+            except TimeoutError:
+                pass
+
+    def sleep(self, seconds: float):
+        """Sleep until pipeline stops"""
+        deadline = time.monotonic() + seconds
+        while True:
+            if self.is_stopped():
+                raise Stopped()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(0.1, remaining))
+
+    def start(self, name: str, target: Callable, *args):
+        """Run stage worker in background thread"""
+        if self.profiler is not None:
+            target = self.profiler.wrap(target)
+
+        def run():
+            try:
+                target(*args)
+            except Stopped:
+                pass
+            except BaseException as e:
+                self.errors.append(e)
+                self.stop()
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def join(self):
+        """Wait for all background stages"""
+        for thread in self.threads:
+            while thread.is_alive():
+                thread.join(timeout=0.1)
+
+    def print_stats(self):
+        """Print per-stage utilization"""
+        wall = time.perf_counter() - self.started
+        print("Stage utilization:")
+        for stats in self.stats.values():
+            utilization = stats.busy / (wall * stats.workers) * 100 if wall > 0 else 0
+            print(f"  {stats.name:<8} {utilization:5.1f}%  busy {stats.busy:.1f}s / {wall:.1f}s, {stats.items} pages")
@@ -0,0 +1,97 @@
+from typing import Dict, Iterator, List, Optional, Sequence
+
+
+class ScrapeState:
+    """
+    Position of a RestartToken chain after a consumed batch, resumable:
+    - token: restart token of the next page (None - first page, or no more pages if done)
+    - records: rows consumed so far
+    - done: chain is complete
+    to_dict() / from_dict() use the same keys as checkpoint journal records
+    """
+
+    __slots__ = ("token", "records", "done")
+
+    def __init__(self, token: Optional[List] = None, records: int = 0, done: bool = False):
+        self.token = token
+        self.records = records
+        self.done = done
+
+    def to_dict(self) -> Dict:
+        return {"token": self.token, "records": self.records, "done": self.done}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScrapeState":
+        return cls(data.get("token"), data.get("records", 0), bool(data.get("done")))
+
+    @classmethod
+    def from_checkpoint(cls, path: str) -> "ScrapeState":
+        """State of last commit in checkpoint journal written by a CLI run (empty state if there is none)"""
+        from journal import CheckpointJournal
+
+        record = CheckpointJournal(path).load()
+        return cls.from_dict(record) if record else cls()
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ScrapeState) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"ScrapeState(records={self.records}, done={self.done}, token={self.token!r})"
+
+
+class RecordBatch:
+    """
+    Rows of one decoded page, column-oriented:
+    - names: output column names
+    - columns: one tuple of values per column, values are typed (str, int, float, datetime.date, None)
+    - dictionary_columns: indexes of ValueDicts columns (few distinct values)
+    - state: ScrapeState after this batch
+    """
+
+    __slots__ = ("names", "columns", "dictionary_columns", "state")
+
+    def __init__(self, names: Sequence[str], rows: List[Sequence], state: ScrapeState,
+                 dictionary_columns: frozenset = frozenset()):
+        self.names = tuple(names)
+        self.columns = tuple(zip(*rows)) if rows else tuple(() for _ in self.names)
+        self.dictionary_columns = frozenset(dictionary_columns)
+        self.state = state
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def column(self, name: str) -> tuple:
+        """Values of column by name"""
+        return self.columns[self.names.index(name)]
+
+    def rows(self) -> Iterator[tuple]:
+        """Rows as tuples, in column order of names"""
+        return zip(*self.columns)
+
+    def __repr__(self) -> str:
+        return f"RecordBatch(rows={len(self)}, columns={len(self.names)}, {self.state!r})"
+
+
+def iter_batches(report=None, state: Optional[ScrapeState] = None, window: int = 500, rps: Optional[float] = 1.0,
+                 log=None, **options) -> Iterator[RecordBatch]:
+    """
+    Stream decoded pages of a report in-process, nothing is written to disk
+    - report: ReportSpec or path of a spec file (default: reports/ohio_permits.json)
+    - state: resume after the batch this state came from
+    - rps: requests per second (None - unlimited), log: callable for retry messages (default: silent)
+    Other options go to PowerBIParserFinal (backend, tz, date_format, retry, decode_pool, ...)
+    Dates are datetime.date unless date_format is given
+    """
+    from main import PowerBIParserFinal
+    from report import DEFAULT_REPORT, ReportSpec
+    from transport import RateLimiter
+    from window import PageWindow
+
+    if not isinstance(report, ReportSpec):
+        report = ReportSpec.load(report or DEFAULT_REPORT)
+    options.setdefault("limiter", RateLimiter(rps=rps))
+    parser = PowerBIParserFinal(report=report, output_format=None, window=PageWindow(window), log=log, **options)
+    try:
+        yield from parser.iter_batches(state)
+    finally:
+        parser.transport.close()
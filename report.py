@@ -0,0 +1,190 @@
+import json
+import os
+import uuid
+from typing import Dict, List, Optional
+
+
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports")
+DEFAULT_REPORT = os.path.join(REPORTS_DIR, "ohio_permits.json")
+
+WINDOW_PATH = ("queries", 0, "Query", "Commands", 0, "SemanticQueryDataShapeCommand",
+               "Binding", "DataReduction", "Primary", "Window")
+WHERE_PATH = ("queries", 0, "Query", "Commands", 0, "SemanticQueryDataShapeCommand", "Query", "Where")
+
+# PowerBI OrderBy Direction values
+DIRECTIONS = {"asc": 1, "desc": 2}
+
+
+def literal(value) -> Dict:
+    """Build PowerBI literal (null, bool, int, float or string)"""
+    if value is None:
+        text = "null"
+    elif isinstance(value, bool):
+        text = "true" if value else "false"
+    elif isinstance(value, int):
+        text = f"{value}L"
+    elif isinstance(value, float):
+        text = f"{value}D"
+    else:
+        text = "'" + str(value).replace("'", "''") + "'"
+    return {"Literal": {"Value": text}}
+
+
+def patched(obj, path: tuple, value):
+    """Copy of obj with value at path, only containers along the path are copied"""
+    if not path:
+        return value
+    key = path[0]
+    copy = list(obj) if isinstance(obj, list) else dict(obj)
+    copy[key] = patched(obj[key], path[1:], value)
+    return copy
+
+
+def get_path(obj, path: tuple):
+    for key in path:
+        obj = obj[key]
+    return obj
+
+
+class QueryTemplate:
+    """
+    Compiled querydata payload
+    render() patches only the Window (page size, restart token), the rest is shared between requests
+    """
+
+    def __init__(self, payload: Dict):
+        self.payload = payload
+
+    def with_where(self, conditions: List[Dict]) -> "QueryTemplate":
+        """Template with extra Where conditions (partitions, sync)"""
+        if not conditions:
+            return self
+        return QueryTemplate(patched(self.payload, WHERE_PATH, get_path(self.payload, WHERE_PATH) + conditions))
+
+    def render(self, restart_tokens: Optional[List] = None, count: int = 500) -> Dict:
+        window = {"Count": count}
+        if restart_tokens:
+            window["RestartTokens"] = [restart_tokens]
+        return patched(self.payload, WINDOW_PATH, window)
+
+
+class ReportSpec:
+    """
+    Declarative description of one public Power BI report query (JSON or YAML):
+    - url, resource_key, model_id: where to send querydata requests
+    - entities: alias -> entity name
+    - columns: [{"column": "alias.Property", "name": output name, "type": "date" (optional)}]
+    - filters: [{"column": ..., "in" | "not_in": [values]}, {"column": ..., "not_null": true}, {"condition": raw}]
+    - order_by: [{"column": ..., "direction": "asc" | "desc"}]
+    """
+
+    def __init__(self, spec: Dict):
+        try:
+            self.name = spec["name"]
+            self.url = spec["url"]
+            self.resource_key = spec["resource_key"]
+            self.model_id = spec["model_id"]
+            self.entities = dict(spec["entities"])
+            self.columns = list(spec["columns"])
+        except KeyError as e:
+            raise ValueError(f"Report spec is missing {e}")
+        self.origin = spec.get("origin", "https://app.powerbi.com")
+        self.activity_id = spec.get("activity_id") or str(uuid.uuid4())
+        self.filters = list(spec.get("filters", []))
+        self.order_by = list(spec.get("order_by", []))
+        self.output = spec.get("output")
+
+    @classmethod
+    def load(cls, path: str) -> "ReportSpec":
+        """Load spec from .json, .yaml or .yml file (YAML requires PyYAML)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RuntimeError("YAML report specs require PyYAML: pip install pyyaml")
+                return cls(yaml.safe_load(f))
+            return cls(json.load(f))
+
+    def headers(self) -> Dict:
+        return {
+            'Accept': 'application/json, text/plain, */*',
+            'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+            'ActivityId': self.activity_id,
+            'Cache-Control': 'no-cache',
+            'Content-Type': 'application/json;charset=UTF-8',
+            'Origin': self.origin,
+            'Referer': self.origin + '/',
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'X-PowerBI-ResourceKey': self.resource_key,
+        }
+
+    def date_columns(self) -> frozenset:
+        """Indexes of columns declared as dates, converted even if the response schema has no DateTime type"""
+        return frozenset(i for i, item in enumerate(self.columns) if item.get("type") == "date")
+
+    def column(self, ref: str) -> Dict:
+        """Column expression for "alias.Property" reference"""
+        alias, _, prop = ref.partition(".")
+        if alias not in self.entities or not prop:
+            raise ValueError(f"{self.name}: unknown column {ref} (entities: {', '.join(self.entities)})")
+        return {"Column": {"Expression": {"SourceRef": {"Source": alias}}, "Property": prop}}
+
+    def condition(self, item: Dict) -> Dict:
+        if "condition" in item:
+            return {"Condition": item["condition"]}
+        column = self.column(item["column"])
+        if "in" in item or "not_in" in item:
+            values = item["in"] if "in" in item else item["not_in"]
+            expression = {"In": {"Expressions": [column], "Values": [[literal(v)] for v in values]}}
+            return {"Condition": expression if "in" in item else {"Not": {"Expression": expression}}}
+        if item.get("not_null"):
+            return {"Condition": {"Not": {"Expression": {"Comparison": {
+                "ComparisonKind": 0, "Left": column, "Right": literal(None)}}}}}
+        raise ValueError(f"{self.name}: unsupported filter {item}")
+
+    def compile(self) -> QueryTemplate:
+        """Build payload once, pages only patch the Window"""
+        select = []
+        for item in self.columns:
+            column = self.column(item["column"])
+            alias, _, prop = item["column"].partition(".")
+            select.append(dict(column, Name=f"{self.entities[alias]}.{prop}", NativeReferenceName=item.get("name", prop)))
+
+        order_by = []
+        for item in self.order_by:
+            direction = item.get("direction", "asc")
+            if direction not in DIRECTIONS:
+                raise ValueError(f"{self.name}: unknown order direction {direction}")
+            order_by.append({"Direction": DIRECTIONS[direction], "Expression": self.column(item["column"])})
+
+        query = {
+            "Version": 2,
+            "From": [{"Name": alias, "Entity": entity, "Type": 0} for alias, entity in self.entities.items()],
+            "Select": select,
+            "Where": [self.condition(item) for item in self.filters],
+        }
+        if order_by:
+            query["OrderBy"] = order_by
+
+        return QueryTemplate({
+            "version": "1.0.0",
+            "queries": [{
+                "Query": {
+                    "Commands": [{
+                        "SemanticQueryDataShapeCommand": {
+                            "Query": query,
+                            "Binding": {
+                                "Primary": {"Groupings": [{"Projections": list(range(len(select))), "Subtotal": 1}]},
+                                "DataReduction": {"DataVolume": 3, "Primary": {"Window": {}}},
+                                "Version": 1
+                            },
+                            "ExecutionMetricsKind": 1
+                        }
+                    }],
+                    "QueryId": ""
+                }
+            }],
+            "cancelQueries": [],
+            "modelId": self.model_id
+        })
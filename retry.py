@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+# Failure kinds, each with its own retry budget
+TIMEOUT = "timeout"
+SERVER = "server"
+THROTTLE = "throttle"
+KINDS = [TIMEOUT, SERVER, THROTTLE]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from Retry-After header (delay in seconds or HTTP date), None if missing or invalid"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    Retries of one page request, budgets are per page and per failure kind:
+    - timeout: timeouts and connection errors
+    - server: 5xx responses
+    - throttle: 429 responses
+    Delay is exponential backoff with jitter (half fixed, half random), at least Retry-After if the server sent it
+    """
+
+    def __init__(self, timeouts: int = 5, server: int = 5, throttle: int = 10, base: float = 1.0,
+                 max_delay: float = 60.0, seed: Optional[int] = None):
+        self.budgets = {TIMEOUT: timeouts, SERVER: server, THROTTLE: throttle}
+        self.base = base
+        self.max_delay = max_delay
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def classify(self, status_code: Optional[int]) -> Optional[str]:
+        """Failure kind of response status (None - request raised), None if not retryable"""
+        if status_code is None:
+            return TIMEOUT
+        if status_code == 429:
+            return THROTTLE
+        if status_code >= 500:
+            return SERVER
+        return None
+
+    def allows(self, kind: str, attempt: int) -> bool:
+        """True if attempt-th retry (1-based) of this kind is within budget"""
+        return attempt <= self.budgets[kind]
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before attempt-th retry"""
+        backoff = min(self.max_delay, self.base * 2 ** (attempt - 1))
+        with self.lock:
+            backoff = backoff / 2 + self.random.uniform(0, backoff / 2)
+        return max(backoff, retry_after or 0.0)
+
+
+class CircuitBreaker:
+    """
+    Shared by all chains requesting one host:
+    - threshold consecutive failures open the breaker, every chain waits cooldown seconds
+    - then one request probes the endpoint (half-open): success closes the breaker, failure opens it again
+    - pause() holds all chains without counting a failure (Retry-After of throttled requests)
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.paused_until = 0.0
+        self.probe_started: Optional[float] = None
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    @property
+    def open(self) -> bool:
+        return bool(self.threshold) and self.failures >= self.threshold
+
+    def delay(self) -> float:
+        """Seconds to wait before sending a request, 0 - go ahead"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if not self.open:
+                return 0.0
+            # Half-open: one probe at a time, a lost probe is replaced after cooldown
+            if self.probe_started is not None and now - self.probe_started < self.cooldown:
+                return min(1.0, self.cooldown)
+            self.probe_started = now
+            return 0.0
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.probe_started = None
+
+    def failure(self) -> bool:
+        """Record failed request, True if it opened the breaker"""
+        with self.lock:
+            was_open = self.open
+            self.failures += 1
+            self.probe_started = None
+            if not self.open:
+                return False
+            self.paused_until = max(self.paused_until, time.monotonic() + self.cooldown)
+            if not was_open:
+                self.trips += 1
+            return not was_open
+
+
+class HostBreakers:
+    """One CircuitBreaker per host, shared by all reports scraped from it"""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.lock = threading.Lock()
+
+    def get(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(threshold=self.threshold, cooldown=self.cooldown)
+            return self.breakers[host]
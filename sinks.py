@@ -0,0 +1,444 @@
+import csv
+import gzip
+import os
+import shutil
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from decoder import DATE_FORMAT
+from journal import fsync_path
+
+
+def restore_offset(path: str, record: Dict) -> tuple[bool, Optional[str]]:
+    """Truncate output back to committed byte offset (none in old journals: resume by record count)"""
+    offset = record.get('offset')
+    if offset is None:
+        return True, None
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if size < offset:
+        return False, f"Output is shorter than checkpoint ({size} < {offset} bytes)"
+    if size > offset:
+        os.truncate(path, offset)
+        return True, f"Output truncated to last commit: {size - offset} bytes dropped"
+    return True, None
+
+
+class CsvSink:
+    """Plain CSV, dates formatted as MM.dd.yyyy"""
+
+    name = "csv"
+    extension = ".csv"
+    date_format: Optional[str] = DATE_FORMAT
+    mergeable = True
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.file = self.open(path, 'a' if append else 'w')
+        self.writer = csv.writer(self.file)
+        self.has_header = append
+
+    @staticmethod
+    def open(path: str, mode: str):
+        return open(path, mode, newline='', encoding='utf-8')
+
+    def write_page(self, columns: List[str], rows: Iterable[List], dictionary_columns: set = frozenset(),
+                   date_columns: set = frozenset()):
+        """Write one decoded page"""
+        if not self.has_header:
+            self.writer.writerow(columns)
+            self.has_header = True
+        self.writer.writerows(rows)
+
+    def flush(self):
+        """Make written pages visible on disk"""
+        self.file.flush()
+
+    def commit(self) -> Optional[int]:
+        """Make written pages durable, returns byte offset to truncate back to on resume"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return os.fstat(self.file.fileno()).st_size
+
+    def discard(self):
+        """Drop pages written after the last commit: resume truncates them"""
+
+    def close(self):
+        self.file.close()
+
+    @classmethod
+    def restore(cls, path: str, record: Dict) -> tuple[bool, Optional[str]]:
+        """Prepare output for resume from checkpoint record, (False, reason) - start over"""
+        return restore_offset(path, record)
+
+    @classmethod
+    def read_pages(cls, path: str) -> Iterator[tuple[List[str], List[List]]]:
+        """Read file back as (columns, rows) pages"""
+        with cls.open(path, 'r') as f:
+            reader = csv.reader(f)
+            columns = next(reader, None)
+            if columns is None:
+                return
+            while True:
+                rows = [row for _, row in zip(range(500), reader)]
+                if not rows:
+                    return
+                yield columns, rows
+
+    def append_file(self, path: str) -> int:
+        """Copy all pages of another file of same format, returns number of rows"""
+        count = 0
+        for columns, rows in self.read_pages(path):
+            self.write_page(columns, rows)
+            count += len(rows)
+        return count
+
+
+class GzipCsvSink(CsvSink):
+    """Gzip-compressed CSV, resume appends a new gzip member"""
+
+    name = "csv.gz"
+    extension = ".csv.gz"
+
+    @staticmethod
+    def open(path: str, mode: str):
+        return gzip.open(path, mode + 't', newline='', encoding='utf-8')
+
+    def commit(self) -> Optional[int]:
+        """Close gzip member, so file can be truncated back to this point"""
+        self.file.close()
+        fsync_path(self.path)
+        self.file = self.open(self.path, 'a')
+        self.writer = csv.writer(self.file)
+        return os.path.getsize(self.path)
+
+
+class ArrowSinkBase:
+    """
+    Columnar sinks (require pyarrow):
+    - one record batch / row group per page
+    - dictionary ("DN") columns stay dictionary-encoded
+    - date columns (report spec or DateTime in "S" schema) are stored as date32
+    Schema is fixed by the first page; column types come from the response schema, not from values,
+    so a page without dates still gets the same schema as any other page
+    """
+
+    name = ""
+    extension = ""
+    date_format: Optional[str] = None
+    mergeable = False
+
+    def __init__(self, path: str, append: bool = False):
+        self.pa = self.import_pyarrow()
+        self.path = path
+        self.writer = None
+        self.schema = None
+
+    @classmethod
+    def import_pyarrow(cls):
+        try:
+            import pyarrow
+        except ImportError:
+            raise RuntimeError(f"{cls.name} format requires pyarrow: pip install pyarrow")
+        return pyarrow
+
+    def build_schema(self, columns: List[str], dictionary_columns: set, date_columns: set):
+        pa = self.pa
+        fields = []
+        for i, name in enumerate(columns):
+            if i in date_columns:
+                field_type = pa.date32()
+            elif i in dictionary_columns:
+                field_type = pa.dictionary(pa.int32(), pa.string())
+            else:
+                field_type = pa.string()
+            fields.append(pa.field(name, field_type))
+        return pa.schema(fields)
+
+    def to_batch(self, rows: List[List]):
+        """Convert rows to record batch matching schema"""
+        pa = self.pa
+        arrays = []
+        for i, field in enumerate(self.schema):
+            values = [row[i] if i < len(row) else None for row in rows]
+            if pa.types.is_date32(field.type):
+                values = [v if v is None or hasattr(v, "toordinal") else None for v in values]
+                arrays.append(pa.array(values, type=field.type))
+                continue
+            values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+            array = pa.array(values, type=pa.string())
+            arrays.append(array.dictionary_encode() if pa.types.is_dictionary(field.type) else array)
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def write_page(self, columns: List[str], rows: Iterable[List], dictionary_columns: set = frozenset(),
+                   date_columns: set = frozenset()):
+        """Write one decoded page as one record batch"""
+        rows = list(rows)
+        if self.writer is None:
+            if self.schema is None:
+                self.schema = self.build_schema(columns, dictionary_columns, date_columns)
+            self.writer = self.open_writer()
+        self.write_batch(self.to_batch(rows))
+
+    def write_batch(self, batch):
+        self.writer.write_batch(batch)
+
+    def flush(self):
+        pass
+
+    def discard(self):
+        """Drop pages written after the last commit"""
+
+
+class ParquetSink(ArrowSinkBase):
+    """
+    Parquet file, one row group per page
+    Parquet footer is written on close only, so pages go to pieces (<path>.pieces/00000.parquet, ...):
+    - commit closes the current piece, a committed piece is a complete file
+    - close() joins committed pieces into path
+    - resume keeps committed pieces and drops the one written after the last commit
+    """
+
+    name = "parquet"
+    extension = ".parquet"
+
+    def __init__(self, path: str, append: bool = False):
+        super().__init__(path, append)
+        self.pieces_dir = path + ".pieces"
+        self.piece = None
+        if append:
+            self.pieces = self.list_pieces(path)
+        else:
+            # New output: forget pieces and file of an earlier run
+            shutil.rmtree(self.pieces_dir, ignore_errors=True)
+            if os.path.exists(path):
+                os.remove(path)
+            self.pieces = []
+        os.makedirs(self.pieces_dir, exist_ok=True)
+
+    @staticmethod
+    def list_pieces(path: str) -> List[str]:
+        pieces_dir = path + ".pieces"
+        if not os.path.isdir(pieces_dir):
+            return []
+        names = sorted(name for name in os.listdir(pieces_dir) if name.endswith(".parquet"))
+        return [os.path.join(pieces_dir, name) for name in names]
+
+    def open_writer(self):
+        import pyarrow.parquet as pq
+        self.piece = os.path.join(self.pieces_dir, f"{len(self.pieces):05d}.parquet")
+        return pq.ParquetWriter(self.piece, self.schema, compression="zstd")
+
+    def write_page(self, columns: List[str], rows: Iterable[List], dictionary_columns: set = frozenset(),
+                   date_columns: set = frozenset()):
+        """Write one decoded page as one row group, resumed output keeps the schema of its committed data"""
+        if self.schema is None:
+            committed = ([self.path] if os.path.exists(self.path) else []) + self.pieces
+            if committed:
+                self.schema = self.read_schema(committed[0])
+        super().write_page(columns, rows, dictionary_columns, date_columns)
+
+    def commit(self) -> Optional[int]:
+        """Close current piece (writes its footer), resume goes by record count"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            fsync_path(self.piece)
+            fsync_path(self.pieces_dir)
+            self.pieces.append(self.piece)
+            self.piece = None
+        return None
+
+    def discard(self):
+        """Remove current piece, its pages were not committed"""
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+            self.writer = None
+            os.remove(self.piece)
+            self.piece = None
+
+    def close(self):
+        self.commit()
+        self.join_pieces(self.path)
+
+    @classmethod
+    def join_pieces(cls, path: str):
+        """Rewrite path with its rows followed by rows of all pieces, then remove pieces"""
+        import pyarrow.parquet as pq
+
+        pieces = cls.list_pieces(path)
+        if pieces:
+            temp = path + ".tmp"
+            writer = None
+            try:
+                for source in ([path] if os.path.exists(path) else []) + pieces:
+                    source = pq.ParquetFile(source)
+                    if writer is None:
+                        writer = pq.ParquetWriter(temp, source.schema_arrow, compression="zstd")
+                    for i in range(source.num_row_groups):
+                        writer.write_table(source.read_row_group(i).cast(writer.schema))
+            finally:
+                if writer is not None:
+                    writer.close()
+            fsync_path(temp)
+            os.replace(temp, path)
+            fsync_path(os.path.dirname(os.path.abspath(path)))
+        shutil.rmtree(path + ".pieces", ignore_errors=True)
+
+    @classmethod
+    def restore(cls, path: str, record: Dict) -> tuple[bool, Optional[str]]:
+        """
+        Keep output file and committed pieces holding record["records"] rows, remove later pieces
+        (an unreadable piece was open when the run was killed). A finished run is joined into path
+        """
+        cls.import_pyarrow()
+        import pyarrow.parquet as pq
+
+        committed = record['records']
+        rows = 0
+        if os.path.exists(path):
+            try:
+                rows = pq.ParquetFile(path).metadata.num_rows
+            except Exception as e:
+                return False, f"Output is unreadable ({e})"
+        dropped = 0
+        for piece in cls.list_pieces(path):
+            if not dropped and rows < committed:
+                try:
+                    piece_rows = pq.ParquetFile(piece).metadata.num_rows
+                except Exception:
+                    piece_rows = None
+                if piece_rows is not None and rows + piece_rows <= committed:
+                    rows += piece_rows
+                    continue
+            os.remove(piece)
+            dropped += 1
+        if rows != committed:
+            return False, f"Output has {rows} of {committed} committed records"
+        if record.get('done'):
+            cls.join_pieces(path)
+        return True, f"Output restored to last commit: {dropped} uncommitted pieces dropped" if dropped else None
+
+    def read_schema(self, path: str):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path)
+
+    def append_file(self, path: str) -> int:
+        import pyarrow.parquet as pq
+        source = pq.ParquetFile(path)
+        if self.writer is None:
+            self.schema = source.schema_arrow
+            self.writer = self.open_writer()
+        for i in range(source.num_row_groups):
+            self.writer.write_table(source.read_row_group(i).cast(self.schema))
+        return source.metadata.num_rows
+
+
+class ArrowSink(ArrowSinkBase):
+    """
+    Arrow IPC stream, one record batch per page
+    Stream format has no footer, so pages written before a crash stay readable
+    A stream can't be appended to: resume keeps the old file as <path>.prev until the copy is committed
+    """
+
+    name = "arrow"
+    extension = ".arrows"
+
+    def __init__(self, path: str, append: bool = False):
+        super().__init__(path, append)
+        self.previous = path + ".prev"
+        if append and os.path.exists(path):
+            os.replace(path, self.previous)
+        else:
+            # New output: forget old file of an interrupted resume
+            if os.path.exists(self.previous):
+                os.remove(self.previous)
+            self.previous = None
+
+    def open_writer(self):
+        self.sink_file = self.pa.OSFile(self.path, 'wb')
+        options = self.pa.ipc.IpcWriteOptions(compression="zstd")
+        return self.pa.ipc.new_stream(self.sink_file, self.schema, options=options)
+
+    def write_page(self, columns: List[str], rows: Iterable[List], dictionary_columns: set = frozenset(),
+                   date_columns: set = frozenset()):
+        """Write one decoded page as one record batch, after a copy of the resumed file"""
+        if self.writer is None and self.previous:
+            self.append_file(self.previous)
+        super().write_page(columns, rows, dictionary_columns, date_columns)
+
+    def flush(self):
+        if self.writer is not None:
+            self.sink_file.flush()
+
+    def commit(self) -> Optional[int]:
+        """Stream without end marker stays readable, so file can be truncated at any batch"""
+        if self.writer is None:
+            return None
+        self.sink_file.flush()
+        fsync_path(self.path)
+        if self.previous:
+            os.remove(self.previous)
+            self.previous = None
+        return os.path.getsize(self.path)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.sink_file.close()
+        if self.previous:
+            # Nothing written since resume
+            os.replace(self.previous, self.path)
+
+    @classmethod
+    def restore(cls, path: str, record: Dict) -> tuple[bool, Optional[str]]:
+        """Copy of resumed file was not committed: go back to the old file, then truncate to committed offset"""
+        previous = path + ".prev"
+        if os.path.exists(previous):
+            os.replace(previous, path)
+        restored, message = restore_offset(path, record)
+        if restored and record.get('offset') and not cls.readable(path):
+            return False, "Output is unreadable"
+        return restored, message
+
+    @classmethod
+    def readable(cls, path: str) -> bool:
+        pa = cls.import_pyarrow()
+        try:
+            with pa.OSFile(path, 'rb') as f:
+                pa.ipc.open_stream(f)
+            return True
+        except (pa.ArrowInvalid, OSError):
+            return False
+
+    def read_schema(self, path: str):
+        with self.pa.OSFile(path, 'rb') as f:
+            return self.pa.ipc.open_stream(f).schema
+
+    def append_file(self, path: str) -> int:
+        count = 0
+        with self.pa.OSFile(path, 'rb') as f:
+            reader = self.pa.ipc.open_stream(f)
+            if self.writer is None:
+                self.schema = reader.schema
+                self.writer = self.open_writer()
+            for batch in reader:
+                self.writer.write_batch(batch)
+                count += batch.num_rows
+        return count
+
+
+SINKS = {
+    CsvSink.name: CsvSink,
+    GzipCsvSink.name: GzipCsvSink,
+    ParquetSink.name: ParquetSink,
+    ArrowSink.name: ArrowSink,
+}
+
+
+def get_sink_class(output_format: str):
+    """Get sink class by format name"""
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown format: {output_format} (available: {', '.join(SINKS)})")
+    return SINKS[output_format]
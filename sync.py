@@ -0,0 +1,172 @@
+import csv
+import hashlib
+import json
+import os
+from datetime import datetime
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional
+
+
+def hash_rows(rows: List[List[str]]) -> str:
+    """Hash of all rows of one Account Number"""
+    digest = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        digest.update("\x1f".join(row).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def read_groups(path: str) -> tuple[Optional[List[str]], Iterator[tuple[str, List[List[str]]]]]:
+    """
+    Read CSV as (columns, iterator of (account_number, rows))
+    Rows are ordered by Account Number, so rows of one account are adjacent
+    """
+    f = open(path, 'r', newline='', encoding='utf-8')
+    reader = csv.reader(f)
+    columns = next(reader, None)
+
+    def groups():
+        try:
+            for key, rows in groupby(reader, key=lambda row: row[0]):
+                yield key, list(rows)
+        finally:
+            f.close()
+
+    return columns, groups()
+
+
+class SyncIndex:
+    """Account Number -> row hash of last synced snapshot, stored as JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows: Dict[str, str] = {}
+        self.last_sync: Optional[datetime] = None
+
+    def load(self):
+        """Load index from file"""
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.rows = data.get('rows', {})
+            self.last_sync = datetime.fromisoformat(data['last_sync']) if data.get('last_sync') else None
+            print(f"\u2713 Sync index loaded: {len(self.rows)} permits, last sync {self.last_sync}")
+
+    def save(self):
+        """Save index atomically (write temp file, then rename)"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'last_sync': self.last_sync.isoformat() if self.last_sync else None,
+                'rows': self.rows
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class ChangeLog:
+    """Appends inserted / changed / removed rows to CSV change log"""
+
+    def __init__(self, path: str, columns: List[str], sync_time: datetime):
+        is_new = not os.path.exists(path)
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.sync_time = sync_time.isoformat(timespec='seconds')
+        self.counts = {'inserted': 0, 'changed': 0, 'removed': 0}
+        if is_new:
+            self.writer.writerow(['Sync Time', 'Change'] + columns)
+
+    def write(self, change: str, rows: List[List[str]]):
+        self.counts[change] += 1
+        for row in rows:
+            self.writer.writerow([self.sync_time, change] + row)
+
+    def close(self):
+        self.file.close()
+
+
+def apply_full_sync(index: SyncIndex, fetched_file: str, snapshot_file: str, changes_file: str,
+                    sync_time: datetime) -> Dict[str, int]:
+    """
+    Diff complete fetched dataset against index
+    Fetched file becomes the new snapshot
+    """
+    columns, fetched = read_groups(fetched_file)
+    log = ChangeLog(changes_file, columns or [], sync_time)
+    rows_index = {}
+    try:
+        for key, rows in fetched:
+            row_hash = hash_rows(rows)
+            rows_index[key] = row_hash
+            old_hash = index.rows.get(key)
+            if old_hash is None:
+                log.write('inserted', rows)
+            elif old_hash != row_hash:
+                log.write('changed', rows)
+
+        # Removed rows are only known from the old snapshot
+        removed = index.rows.keys() - rows_index.keys()
+        if removed and os.path.exists(snapshot_file):
+            _, old_groups = read_groups(snapshot_file)
+            for key, rows in old_groups:
+                if key in removed:
+                    log.write('removed', rows)
+    finally:
+        log.close()
+
+    os.replace(fetched_file, snapshot_file)
+    index.rows = rows_index
+    index.last_sync = sync_time
+    return log.counts
+
+
+def apply_narrowed_sync(index: SyncIndex, fetched_file: str, snapshot_file: str, changes_file: str,
+                        sync_time: datetime) -> Dict[str, int]:
+    """
+    Merge fetched accounts into existing snapshot
+    fetched_file must hold all rows of each account (not only rows matching the date filter),
+    they replace the account's rows in the snapshot. Removed accounts can't be detected without a full fetch
+    """
+    columns, fetched = read_groups(fetched_file)
+    fetched_groups = dict(fetched)
+    log = ChangeLog(changes_file, columns or [], sync_time)
+
+    inserted = sorted(key for key in fetched_groups if key not in index.rows)
+    tmp_path = snapshot_file + ".tmp"
+    try:
+        old_columns, old_groups = read_groups(snapshot_file)
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns or old_columns)
+            pos = 0
+            unwritten = set(fetched_groups)
+            for key, rows in old_groups:
+                # New accounts go before first greater existing one
+                while pos < len(inserted) and inserted[pos] < key:
+                    new_key = inserted[pos]
+                    pos += 1
+                    if new_key in unwritten:
+                        log.write('inserted', fetched_groups[new_key])
+                        writer.writerows(fetched_groups[new_key])
+                        unwritten.discard(new_key)
+
+                new_rows = fetched_groups.get(key)
+                if new_rows is not None and key in unwritten:
+                    if hash_rows(new_rows) != index.rows.get(key):
+                        log.write('changed' if key in index.rows else 'inserted', new_rows)
+                    unwritten.discard(key)
+                    rows = new_rows
+                writer.writerows(rows)
+
+            # Inserted after last existing account, or missing from old snapshot
+            for key in sorted(unwritten):
+                log.write('changed' if key in index.rows else 'inserted', fetched_groups[key])
+                writer.writerows(fetched_groups[key])
+    finally:
+        log.close()
+
+    os.replace(tmp_path, snapshot_file)
+    os.remove(fetched_file)
+    for key, rows in fetched_groups.items():
+        index.rows[key] = hash_rows(rows)
+    index.last_sync = sync_time
+    return log.counts
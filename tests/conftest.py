@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Modules are flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_parser(tmp_path):
+    """PowerBIParserFinal fetching from a MockEndpoint: make_parser(endpoint, name, **options)"""
+    from main import PowerBIParserFinal
+    from metrics import Metrics
+    from report import DEFAULT_REPORT, ReportSpec
+    from retry import CircuitBreaker, RetryPolicy
+    from transport import RateLimiter
+    from window import PageWindow
+
+    with open(DEFAULT_REPORT, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    parsers = []
+
+    def make(endpoint, name: str, output_format: str = "csv", page_size: int = 500, **options):
+        from sinks import SINKS
+
+        options.setdefault("output_csv", str(tmp_path / (name + SINKS[output_format].extension)))
+        options.setdefault("checkpoint_file", str(tmp_path / (name + ".json")))
+        options.setdefault("limiter", RateLimiter(rps=None))
+        options.setdefault("metrics", Metrics())
+        options.setdefault("retry", RetryPolicy(base=0.01, max_delay=0.1, seed=0))
+        options.setdefault("breaker", CircuitBreaker(cooldown=0.1))
+        parser = PowerBIParserFinal(
+            output_format=output_format,
+            window=PageWindow(page_size, max_count=page_size),
+            report=ReportSpec(dict(spec, url=endpoint.url)),
+            **options
+        )
+        parsers.append(parser)
+        return parser
+
+    yield make
+    for parser in parsers:
+        parser.transport.close()
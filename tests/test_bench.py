@@ -0,0 +1,35 @@
+import pytest
+
+from bench.run import bench_decode, bench_e2e, bench_write
+from sinks import SINKS
+
+ROWS = 5000
+PAGE = 1000
+
+
+@pytest.fixture
+def measure(request):
+    """
+    measure(function, *args): pytest-benchmark's benchmark fixture if it is installed,
+    otherwise one call, so the benchmarks still run as smoke tests
+    """
+    if request.config.pluginmanager.hasplugin("benchmark"):
+        benchmark = request.getfixturevalue("benchmark")
+        return lambda function, *args: benchmark.pedantic(function, args, rounds=3, iterations=1)
+    return lambda function, *args: function(*args)
+
+
+def test_decode(measure):
+    assert measure(bench_decode, ROWS, PAGE) > 0
+
+
+@pytest.mark.parametrize("output_format", list(SINKS))
+def test_write(measure, tmp_path, output_format):
+    if output_format in ("arrow", "parquet"):
+        pytest.importorskip("pyarrow")
+    assert measure(bench_write, ROWS, PAGE, output_format, str(tmp_path)) > 0
+
+
+def test_e2e(measure, tmp_path):
+    # Raises unless all rows arrive
+    assert measure(bench_e2e, ROWS, PAGE, "csv", str(tmp_path)) > 0
@@ -0,0 +1,99 @@
+import io
+import os
+import time
+
+import pytest
+
+from bench.mock_server import MockEndpoint
+from bench.synthetic import SyntheticReport
+from cache import CacheMiss, ReplayTransport, ResponseCache
+
+URL = "http://localhost/public/reports/querydata"
+
+
+def payload(i):
+    return {"queries": [{"Query": {"Commands": [{"SemanticQueryDataShapeCommand": {"Binding": {"DataReduction": {
+        "Primary": {"Window": {"Count": 500, "RestartTokens": [[f"'{i}'"]]}}}}}}]}}]}
+
+
+def put(cache, i, size=1000):
+    # Random bytes don't compress: every entry takes about size bytes
+    cache.put(URL, payload(i), io.BytesIO(os.urandom(size)))
+
+
+def set_used(cache, i, when):
+    path = cache.path(cache.key(URL, payload(i)))
+    os.utime(path, (when, os.stat(path).st_mtime))
+
+
+def test_lru_eviction(tmp_path):
+    """Over max_bytes, least recently used entries go first, down to the low-water mark"""
+    cache = ResponseCache(str(tmp_path), max_bytes=5500)
+    now = time.time()
+    for i in range(5):
+        put(cache, i)
+        set_used(cache, i, now - 100 + i)
+    # Entry 0 is used again: entries 1 and 2 are now the least recently used
+    set_used(cache, 0, now)
+
+    put(cache, 5)
+    assert cache.size <= 5500 * cache.low_water
+    cached = [i for i in range(6) if cache.get(URL, payload(i)) is not None]
+    assert cached == [0, 3, 4, 5]
+    assert cache.size == sum(os.path.getsize(path) for path in cache.entries())
+
+
+def test_eviction_scans_once_per_many_puts(tmp_path, monkeypatch):
+    """A full cache is not scanned on every put"""
+    cache = ResponseCache(str(tmp_path), max_bytes=100 * 1024)
+    scans = []
+    entries = cache.entries
+    monkeypatch.setattr(cache, "entries", lambda: scans.append(1) or entries())
+    for i in range(300):
+        put(cache, i)
+    assert cache.size <= cache.max_bytes
+    assert 0 < len(scans) <= 300 // 8
+
+
+def test_ttl_expiry(tmp_path):
+    """Expired entries are misses and removed, replay still uses them"""
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    put(cache, 0)
+    put(cache, 1)
+    path = cache.path(cache.key(URL, payload(0)))
+    os.utime(path, (time.time(), time.time() - 120))
+
+    assert ReplayTransport(cache).post(URL, payload(0)).status_code == 200
+    assert cache.get(URL, payload(1)) is not None
+    assert cache.get(URL, payload(0)) is None
+    assert not os.path.exists(path)
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_replay_cache_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    with pytest.raises(CacheMiss):
+        ReplayTransport(cache).post(URL, payload(0))
+    with pytest.raises(CacheMiss):
+        ReplayTransport(cache).submit(URL, payload(0)).result()
+
+
+def test_replay_run(make_parser, tmp_path):
+    """A cached run replays without the endpoint, an uncached page stops the replay"""
+    cache = ResponseCache(str(tmp_path / "cache"))
+    with MockEndpoint(SyntheticReport(500)) as endpoint:
+        parser = make_parser(endpoint, "fetched", page_size=100, cache=cache)
+        assert parser.fetch_all_data(resume=False) == 500
+
+    replay = make_parser(endpoint, "replayed", page_size=100, cache=cache, replay=True)
+    assert replay.fetch_all_data(resume=False) == 500
+    with open(parser.output_csv, 'rb') as fetched, open(replay.output_csv, 'rb') as replayed:
+        assert fetched.read() == replayed.read()
+
+    # Pages of another query are not cached
+    missing = make_parser(endpoint, "missing", page_size=100, cache=cache, replay=True,
+                          extra_where=[{"Condition": {"Comparison": {"ComparisonKind": 0, "Left": {"Column": {
+                              "Expression": {"SourceRef": {"Source": "d"}}, "Property": "Account Number"}},
+                              "Right": {"Literal": {"Value": "'000000001'"}}}}}])
+    assert missing.fetch_all_data(resume=False) == 0
+    assert not missing.completed
@@ -0,0 +1,170 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROWS = 400
+PAGE = 100
+COMMIT_EVERY = 2
+CRASH_EXIT = 9
+FORMATS = ["csv", "csv.gz", "arrow", "parquet"]
+
+
+def build_parser(url: str, output_format: str, output: str, checkpoint: str):
+    import json
+
+    from main import PowerBIParserFinal
+    from report import DEFAULT_REPORT, ReportSpec
+    from retry import CircuitBreaker, RetryPolicy
+    from transport import RateLimiter
+    from window import PageWindow
+
+    with open(DEFAULT_REPORT, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    return PowerBIParserFinal(
+        output_csv=output,
+        checkpoint_file=checkpoint,
+        limiter=RateLimiter(rps=None),
+        output_format=output_format,
+        window=PageWindow(PAGE, max_count=PAGE),
+        report=ReportSpec(dict(spec, url=url)),
+        retry=RetryPolicy(base=0.01, max_delay=0.1, seed=0),
+        breaker=CircuitBreaker(cooldown=0.1),
+        commit_every=COMMIT_EVERY,
+        # Commit by page count only
+        commit_interval=3600
+    )
+
+
+def inject_crash(output_format: str, crash_at: int):
+    """Exit the process without cleanup right before or after the crash_at-th write, commit, fsync or rename"""
+    import journal
+    import sinks
+
+    calls = [0]
+
+    def tick():
+        calls[0] += 1
+        if calls[0] == crash_at:
+            os._exit(CRASH_EXIT)
+
+    def crashing(function):
+        def wrapper(*args, **kwargs):
+            tick()
+            result = function(*args, **kwargs)
+            tick()
+            return result
+        return wrapper
+
+    sink_class = sinks.SINKS[output_format]
+    sink_class.write_page = crashing(sink_class.write_page)
+    sink_class.commit = crashing(sink_class.commit)
+    journal.CheckpointJournal.commit = crashing(journal.CheckpointJournal.commit)
+    os.fsync = crashing(os.fsync)
+    os.replace = crashing(os.replace)
+
+
+def run_crashing(url: str, output_format: str, output: str, checkpoint: str, crash_at: int) -> int:
+    """Fetch (resuming) in a child process that crashes at crash_at, returns its exit code"""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONIOENCODING="utf-8:surrogatepass")
+    return subprocess.run([sys.executable, os.path.abspath(__file__), url, output_format, output, checkpoint,
+                           str(crash_at)], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+
+
+def read_keys(output_format: str, path: str):
+    """First column of all output rows"""
+    if output_format in ("csv", "csv.gz"):
+        from sinks import SINKS
+        return [row[0] for _, rows in SINKS[output_format].read_pages(path) for row in rows]
+    pa = pytest.importorskip("pyarrow")
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+    else:
+        with pa.OSFile(path, 'rb') as f:
+            table = pa.ipc.open_stream(f).read_all()
+    return table.column(0).to_pylist()
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_resume_after_crash_at_every_point(tmp_path, output_format):
+    """Kill at every write / commit / fsync / rename, resume: all rows exactly once, in order"""
+    if output_format in ("arrow", "parquet"):
+        pytest.importorskip("pyarrow")
+    from bench.mock_server import MockEndpoint
+    from bench.synthetic import SyntheticReport
+    from sinks import SINKS
+
+    expected = [f"{i:09d}" for i in range(ROWS)]
+    with MockEndpoint(SyntheticReport(ROWS)) as endpoint:
+        crash_at = 0
+        while True:
+            crash_at += 1
+            directory = tmp_path / str(crash_at)
+            directory.mkdir()
+            output = str(directory / ("out" + SINKS[output_format].extension))
+            checkpoint = str(directory / "checkpoint.json")
+
+            code = run_crashing(endpoint.url, output_format, output, checkpoint, crash_at)
+            if code == 0:
+                # Run finished before reaching this point: all points covered
+                break
+            assert code == CRASH_EXIT, f"crash point {crash_at}: exit code {code}"
+
+            parser = build_parser(endpoint.url, output_format, output, checkpoint)
+            try:
+                assert parser.fetch_all_data(resume=True) == ROWS, f"crash point {crash_at}"
+            finally:
+                parser.transport.close()
+            assert read_keys(output_format, output) == expected, f"crash point {crash_at}"
+
+    assert crash_at > 4 * (ROWS // PAGE)
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_resume_after_write_error(tmp_path, monkeypatch, output_format):
+    """Failed write between commits: pages written since the last commit are not duplicated on resume"""
+    if output_format in ("arrow", "parquet"):
+        pytest.importorskip("pyarrow")
+    from bench.mock_server import MockEndpoint
+    from bench.synthetic import SyntheticReport
+    from sinks import SINKS
+
+    sink_class = SINKS[output_format]
+    output = str(tmp_path / ("out" + sink_class.extension))
+    checkpoint = str(tmp_path / "checkpoint.json")
+    write_page = sink_class.write_page
+    calls = [0]
+
+    def failing_write_page(self, *args, **kwargs):
+        calls[0] += 1
+        if calls[0] == COMMIT_EVERY + 2:
+            raise OSError("No space left on device")
+        return write_page(self, *args, **kwargs)
+
+    with MockEndpoint(SyntheticReport(ROWS)) as endpoint:
+        monkeypatch.setattr(sink_class, "write_page", failing_write_page)
+        parser = build_parser(endpoint.url, output_format, output, checkpoint)
+        try:
+            parser.fetch_all_data(resume=True)
+        finally:
+            parser.transport.close()
+        assert not parser.completed
+
+        monkeypatch.setattr(sink_class, "write_page", write_page)
+        parser = build_parser(endpoint.url, output_format, output, checkpoint)
+        try:
+            assert parser.fetch_all_data(resume=True) == ROWS
+        finally:
+            parser.transport.close()
+
+    assert read_keys(output_format, output) == [f"{i:09d}" for i in range(ROWS)]
+
+
+if __name__ == "__main__":
+    url, output_format, output, checkpoint, crash_at = sys.argv[1:]
+    inject_crash(output_format, int(crash_at))
+    parser = build_parser(url, output_format, output, checkpoint)
+    parser.fetch_all_data(resume=True)
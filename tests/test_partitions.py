@@ -0,0 +1,76 @@
+import pytest
+
+from bench.mock_server import MockEndpoint
+from bench.synthetic import SyntheticReport
+from decoder import decode_response
+from main import account_range_partitions, county_partitions
+from report import WHERE_PATH, get_path
+from test_crash import read_keys
+
+
+ROWS = 3000
+
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("partitions", [
+    account_range_partitions(["000000700", "000002100"]),
+    county_partitions([["Category 1", "Category 2"], ["Category 3"]]),
+], ids=["ranges", "counties"])
+def test_partitions_match_single_chain(make_parser, partitions):
+    """Partition outputs merged together are exactly the output of one RestartToken chain"""
+    report = SyntheticReport(ROWS)
+    with MockEndpoint(report) as endpoint:
+        single = make_parser(endpoint, "single")
+        assert single.fetch_all_data(resume=False) == ROWS
+
+        parser = make_parser(endpoint, "partitioned")
+        assert parser.fetch_partitioned(partitions, resume=False) == ROWS
+
+    # Each partition is a filtered subset, together they cover all rows once
+    sizes = [count_rows(report, endpoint.row_filter(partition["where"])) for partition in partitions]
+    assert all(0 < size < ROWS for size in sizes)
+    assert sum(sizes) == ROWS
+    assert read_text(parser.output_csv) == read_text(single.output_csv)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "arrow"])
+def test_empty_partition(make_parser, output_format):
+    """A partition without rows leaves no columnar part file, the merge skips it"""
+    if output_format != "csv":
+        pytest.importorskip("pyarrow")
+    with MockEndpoint(SyntheticReport(1000)) as endpoint:
+        single = make_parser(endpoint, "single", output_format)
+        assert single.fetch_all_data(resume=False) == 1000
+
+        parser = make_parser(endpoint, "partitioned", output_format)
+        partitions = account_range_partitions(["000000500", "000005000"])
+        assert parser.fetch_partitioned(partitions, resume=False) == 1000
+        assert parser.completed
+
+    assert read_keys(output_format, parser.output_csv) == read_keys(output_format, single.output_csv)
+
+
+def test_mock_applies_where(make_parser):
+    """Account Number range and County Not In conditions narrow the served rows"""
+    report = SyntheticReport(1000)
+    with MockEndpoint(report) as endpoint:
+        where = account_range_partitions(["000000100", "000000200"])[1]["where"]
+        page = report.page(0, 500, endpoint.row_filter(where))
+        rows = decode_response(page, date_format=None)[1]
+        assert [row[0] for row in rows] == [f"{i:09d}" for i in range(100, 200)]
+
+        rest = endpoint.row_filter(county_partitions([["Category 1"]])[1]["where"])
+        assert 0 < count_rows(report, rest) < 1000
+        assert all(report.row(i)[9] != "Category 1" for i in range(1000) if rest(report.row(i)))
+
+        # Report filters: only "Account Number not null" is on a mock column, it passes every row
+        report_filters = get_path(make_parser(endpoint, "all").template.payload, WHERE_PATH)
+        assert count_rows(report, endpoint.row_filter(report_filters)) == 1000
+
+
+def count_rows(report, predicate):
+    return sum(1 for i in range(report.rows) if predicate(report.row(i)))
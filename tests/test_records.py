@@ -0,0 +1,83 @@
+import json
+import threading
+
+import pytest
+
+from bench.mock_server import MockEndpoint
+from bench.synthetic import SyntheticReport
+from records import ScrapeState, iter_batches
+from report import DEFAULT_REPORT, ReportSpec
+from retry import CircuitBreaker, RetryPolicy
+
+ROWS = 500
+PAGE = 100
+
+
+def batches(endpoint, state=None, **options):
+    with open(DEFAULT_REPORT, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    return iter_batches(ReportSpec(dict(spec, url=endpoint.url)), state, window=PAGE, rps=None,
+                        retry=RetryPolicy(base=0.01, max_delay=0.1, seed=0), breaker=CircuitBreaker(cooldown=0.1),
+                        **options)
+
+
+def keys(batch):
+    return list(batch.columns[0])
+
+
+def test_resume_from_batch_state():
+    """Resuming from the state of the second batch yields the remaining rows exactly once"""
+    with MockEndpoint(SyntheticReport(ROWS)) as endpoint:
+        first = batches(endpoint)
+        consumed = [next(first), next(first)]
+        first.close()
+        state = consumed[-1].state
+        assert (state.records, state.done) == (2 * PAGE, False)
+
+        rest = list(batches(endpoint, ScrapeState.from_dict(state.to_dict())))
+
+    rows = [key for batch in consumed + rest for key in keys(batch)]
+    assert rows == [f"{i:09d}" for i in range(ROWS)]
+    assert [batch.state.done for batch in rest] == [False] * (len(rest) - 1) + [True]
+    assert rest[-1].state.records == ROWS
+    assert list(batches(endpoint, rest[-1].state)) == []
+
+
+def test_status_error_raised():
+    """A status that is not retried raises with the status, also without log"""
+    with MockEndpoint(SyntheticReport(ROWS)) as endpoint:
+        respond = endpoint.respond
+        endpoint.respond = lambda payload: (403, b'{"error": "Forbidden"}') if endpoint.requests >= 2 \
+            else respond(payload)
+        received = []
+        with pytest.raises(RuntimeError, match="Page 3: status 403"):
+            for batch in batches(endpoint):
+                received.append(batch)
+    assert len(received) == 2
+
+
+def test_early_close_stops_pipeline():
+    with MockEndpoint(SyntheticReport(ROWS * 10)) as endpoint:
+        running = set(threading.enumerate())
+        stream = batches(endpoint)
+        assert len(next(stream)) == PAGE
+        assert set(threading.enumerate()) - running
+        stream.close()
+        assert not [thread for thread in set(threading.enumerate()) - running if thread.name.endswith("-fetch")]
+
+
+def test_state_from_cli_checkpoint(make_parser):
+    """A CLI run's journal resumes in-process from the same position"""
+    with MockEndpoint(SyntheticReport(ROWS)) as endpoint:
+        script = endpoint.respond
+        endpoint.respond = lambda payload: (403, b'{}') if endpoint.requests >= 3 else script(payload)
+        parser = make_parser(endpoint, "out", page_size=PAGE, commit_every=1)
+        assert parser.fetch_all_data(resume=False) == 3 * PAGE
+        endpoint.respond = script
+
+        state = ScrapeState.from_checkpoint(parser.checkpoint_file)
+        assert (state.records, state.done) == (3 * PAGE, False)
+        rest = list(batches(endpoint, state))
+
+    assert [key for batch in rest for key in keys(batch)] == [f"{i:09d}" for i in range(3 * PAGE, ROWS)]
+    assert ScrapeState.from_checkpoint(str(parser.checkpoint_file) + ".missing") == ScrapeState()
@@ -0,0 +1,121 @@
+import re
+import threading
+import time
+
+from bench.mock_server import MockEndpoint
+from bench.synthetic import SyntheticReport
+from main import account_range_partitions
+from metrics import Metrics
+from records import ScrapeState
+from retry import CircuitBreaker, RetryPolicy
+from test_crash import read_keys
+
+
+FAULTS = {"error": "error_rate", "throttle": "throttle_rate", "drop": "drop_rate"}
+
+
+def script_faults(endpoint, faults):
+    """
+    Answer requests in order with the given faults ("error" - 503, "throttle" - 429, "drop", None - page),
+    later requests get pages. Returns list of (arrival time, fault) of all requests
+    """
+    respond = endpoint.respond
+    lock = threading.Lock()
+    requests = []
+
+    def scripted(payload):
+        with lock:
+            fault = faults[len(requests)] if len(requests) < len(faults) else None
+            requests.append((time.monotonic(), fault))
+            for name, rate in FAULTS.items():
+                setattr(endpoint, rate, 1.0 if name == fault else 0.0)
+            return respond(payload)
+
+    endpoint.respond = scripted
+    return requests
+
+
+def retry_delays(messages):
+    return [float(m) for message in messages for m in re.findall(r"retry \d+ in ([\d.]+)s", message)]
+
+
+def test_throttle_waits_retry_after_without_tripping_breaker(make_parser):
+    """429s wait at least Retry-After and don't count as breaker failures, even more than threshold in a row"""
+    messages = []
+    metrics = Metrics()
+    with MockEndpoint(SyntheticReport(300), retry_after=0.3) as endpoint:
+        requests = script_faults(endpoint, ["throttle"] * 6)
+        parser = make_parser(endpoint, "out", page_size=100, log=messages.append, metrics=metrics,
+                             breaker=CircuitBreaker(threshold=5, cooldown=30))
+        started = time.monotonic()
+        assert parser.fetch_all_data(resume=False) == 300
+        elapsed = time.monotonic() - started
+
+    assert endpoint.throttled == 6
+    assert retry_delays(messages) == [0.3] * 6
+    # Each retry is sent Retry-After after the throttled request
+    gaps = [later[0] - earlier[0] for earlier, later in zip(requests, requests[1:7])]
+    assert all(gap >= 0.29 for gap in gaps)
+    assert elapsed < 10
+    summary = metrics.summary()
+    assert summary["retries_throttle"] == 6
+    assert "breaker_trips" not in summary
+
+
+def test_budgets_per_failure_kind(make_parser):
+    """Failures of one kind don't use up the budget of another"""
+    metrics = Metrics()
+    faults = ["error", "error", "throttle", "throttle", "drop", "drop"]
+    with MockEndpoint(SyntheticReport(300)) as endpoint:
+        script_faults(endpoint, faults)
+        parser = make_parser(endpoint, "out", page_size=100, metrics=metrics,
+                             retry=RetryPolicy(timeouts=2, server=2, throttle=2, base=0.01, max_delay=0.1, seed=0))
+        assert parser.fetch_all_data(resume=False) == 300
+
+    summary = metrics.summary()
+    assert (summary["retries_server"], summary["retries_throttle"], summary["retries_timeout"]) == (2, 2, 2)
+    assert summary["retries"] == 6
+
+
+def test_exhausted_budget_stops_run_and_keeps_checkpoint(make_parser, capsys):
+    """Run stops at the page whose budget ran out, the next run resumes from it"""
+    retry = RetryPolicy(timeouts=2, server=2, throttle=2, base=0.01, max_delay=0.1, seed=0)
+    with MockEndpoint(SyntheticReport(500)) as endpoint:
+        script_faults(endpoint, [None, None, "error", "error", "error"])
+        parser = make_parser(endpoint, "out", page_size=100, commit_every=1, retry=retry)
+        assert parser.fetch_all_data(resume=False) == 200
+        assert not parser.completed
+        assert "Page 3: status 503, giving up after 2 server retries" in capsys.readouterr().out
+        assert ScrapeState.from_checkpoint(parser.checkpoint_file).records == 200
+
+        resumed = make_parser(endpoint, "out", page_size=100, commit_every=1, retry=retry)
+        assert resumed.fetch_all_data(resume=True) == 500
+        assert resumed.completed
+
+    assert read_keys("csv", resumed.output_csv) == [f"{i:09d}" for i in range(500)]
+
+
+def test_breaker_pauses_all_chains_of_host(make_parser):
+    """
+    Consecutive 5xx open the breaker: no chain sends a request until the cooldown is over
+    Four errors: whichever chain gets them, two failures are counted before any success
+    """
+    messages = []
+    metrics = Metrics()
+    cooldown = 1.0
+    with MockEndpoint(SyntheticReport(1000)) as endpoint:
+        requests = script_faults(endpoint, ["error"] * 4)
+        parser = make_parser(endpoint, "out", page_size=100, metrics=metrics,
+                             log=lambda message: messages.append((time.monotonic(), message)),
+                             breaker=CircuitBreaker(threshold=2, cooldown=cooldown))
+        assert parser.fetch_partitioned(account_range_partitions(["000000500"]), resume=False) == 1000
+
+    trips = [t for t, message in messages if "Endpoint degraded" in message]
+    assert len(trips) == 1
+    tripped = trips[0]
+    # Requests in flight when the breaker opened may still arrive, nothing is sent during the cooldown
+    paused = [t for t, _ in requests if tripped + 0.1 < t < tripped + cooldown - 0.1]
+    assert paused == []
+    assert sum(1 for t, _ in requests if t >= tripped + cooldown - 0.1) >= 10
+    assert metrics.summary()["breaker_trips"] == 1
+    assert metrics.summary()["retries_server"] == 4
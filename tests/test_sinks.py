@@ -0,0 +1,63 @@
+from datetime import date
+
+import pytest
+
+from bench.synthetic import DATE, SyntheticReport
+from decoder import decode_response, get_columns_types, get_date_columns, get_dictionary_columns
+from sinks import SINKS
+
+
+def write_pages(sink, pages, date_columns=frozenset()):
+    for page in pages:
+        columns, rows, _ = decode_response(page, date_format=sink.date_format)
+        sink.write_page(columns, rows, get_dictionary_columns(page), get_date_columns(get_columns_types(page),
+                                                                                      date_columns))
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_date_column_without_dates_on_first_page(tmp_path, output_format):
+    """Column type comes from the schema: an all-null first page must not turn a date column into strings"""
+    pa = pytest.importorskip("pyarrow")
+    sink_class = SINKS[output_format]
+    path = str(tmp_path / ("out" + sink_class.extension))
+    report = SyntheticReport(40, kinds=["number", "text", "date"], null_density=0.0, repeat_density=0.0)
+    first = report.page(0, 20)
+    # Null out the date column of the first page only
+    for item in first["results"][0]["result"]["data"]["dsr"]["DS"][0]["PH"][0]["DM0"]:
+        item["C"] = item["C"][:2]
+        item["Ø"] = 1 << 2
+
+    sink = sink_class(path)
+    write_pages(sink, [first, report.page(20, 20)])
+    sink.close()
+
+    table = read_table(pa, output_format, path)
+    assert table.schema.field(2).type == pa.date32()
+    values = table.column(2).to_pylist()
+    assert values[:20] == [None] * 20
+    assert all(isinstance(v, date) for v in values[20:])
+
+
+def test_declared_date_columns(tmp_path):
+    """Report spec date columns are dates even if the response schema has no DateTime type"""
+    pa = pytest.importorskip("pyarrow")
+    sink_class = SINKS["parquet"]
+    path = str(tmp_path / "out.parquet")
+    report = SyntheticReport(10, kinds=["number", DATE], null_density=0.0)
+    page = report.page(0, 10)
+    for col in page["results"][0]["result"]["data"]["dsr"]["DS"][0]["PH"][0]["DM0"][0]["S"]:
+        col["T"] = 1
+
+    sink = sink_class(path)
+    columns, rows, _ = decode_response(page, date_format=None, date_columns=frozenset({1}))
+    sink.write_page(columns, rows, set(), get_date_columns(get_columns_types(page), frozenset({1})))
+    sink.close()
+    assert read_table(pa, "parquet", path).schema.field(1).type == pa.date32()
+
+
+def read_table(pa, output_format, path):
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path)
+    with pa.OSFile(path, 'rb') as f:
+        return pa.ipc.open_stream(f).read_all()
@@ -0,0 +1,67 @@
+import csv
+import time
+
+from bench.mock_server import MockEndpoint
+from bench.synthetic import SyntheticReport, default_kinds
+
+
+SUBMITTED_DATE = 11
+OLD = 1546300800000  # 2019-01-01
+RECENT = int(time.time()) // 86400 * 86400000
+
+
+class RowsReport(SyntheticReport):
+    """Synthetic report serving given raw rows"""
+
+    def __init__(self, rows):
+        super().__init__(len(rows))
+        self.data = rows
+
+    def row(self, i):
+        return list(self.data[i])
+
+
+def permit_row(account, submitted, name="Store"):
+    row = [None] * len(default_kinds())
+    row[0] = account
+    row[1] = name
+    row[SUBMITTED_DATE] = submitted
+    return row
+
+
+def read_rows(path):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))[1:]
+
+
+def test_narrowed_sync_keeps_older_rows_of_changed_permits(make_parser, tmp_path):
+    """Date filter matches only the recent row of a permit, its older rows must stay in the snapshot"""
+    report = RowsReport([
+        permit_row("000000001", OLD),
+        permit_row("000000001", RECENT),
+        permit_row("000000002", OLD),
+    ])
+    index_file = str(tmp_path / "index.json")
+    changes_file = str(tmp_path / "changes.csv")
+
+    with MockEndpoint(report) as endpoint:
+        parser = make_parser(endpoint, "snapshot")
+        assert parser.sync(index_file, changes_file) == {'inserted': 2, 'changed': 0, 'removed': 0}
+        snapshot = read_rows(parser.output_csv)
+        assert len(snapshot) == 3
+
+        # Nothing changed: no rows lost, no false changes
+        assert parser.sync(index_file, changes_file) == {'inserted': 0, 'changed': 0, 'removed': 0}
+        assert read_rows(parser.output_csv) == snapshot
+
+        report.data[1] = permit_row("000000001", RECENT, name="Market")
+        report.data.append(permit_row("000000003", RECENT))
+        report.rows = len(report.data)
+        assert parser.sync(index_file, changes_file) == {'inserted': 1, 'changed': 1, 'removed': 0}
+
+    rows = read_rows(parser.output_csv)
+    assert [row[:2] for row in rows] == [["000000001", "Store"], ["000000001", "Market"],
+                                          ["000000002", "Store"], ["000000003", "Store"]]
+    assert rows[0] == snapshot[0] and rows[2] == snapshot[2]
+    changed = [row for row in read_rows(changes_file) if row[1] == 'changed']
+    assert [row[2:4] for row in changed] == [["000000001", "Store"], ["000000001", "Market"]]
@@ -0,0 +1,252 @@
+import io
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Dict, Optional
+from urllib.parse import urlsplit
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all requests of a run:
+    - rps: requests per second (None - unlimited)
+    - burst: requests allowed at once before throttling
+    - concurrency: requests in flight at the same time
+    """
+
+    def __init__(self, rps: Optional[float] = None, burst: int = 1, concurrency: int = 4):
+        self.rps = rps
+        self.burst = burst
+        self.concurrency = concurrency
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(concurrency)
+
+    def reserve(self) -> float:
+        """Take one token, return seconds to wait before using it"""
+        if not self.rps:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rps)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rps
+
+    def acquire(self):
+        """Block until request is allowed (call release() when done)"""
+        self.slots.acquire()
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self):
+        self.slots.release()
+
+
+class HostRateLimiters:
+    """One RateLimiter per host, shared by all reports scraped from it"""
+
+    def __init__(self, rps: Optional[float] = None, burst: int = 1, concurrency: int = 4):
+        self.rps = rps
+        self.burst = burst
+        self.concurrency = concurrency
+        self.limiters: Dict[str, RateLimiter] = {}
+        self.lock = threading.Lock()
+
+    def get(self, url: str) -> RateLimiter:
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.limiters:
+                self.limiters[host] = RateLimiter(rps=self.rps, burst=self.burst, concurrency=self.concurrency)
+            return self.limiters[host]
+
+
+# Streamed bodies bigger than this are spooled to a temporary file
+SPOOL_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class TransportResponse:
+    """
+    Minimal response object shared by all backends
+    Body is either in memory (content) or spooled to a file (body_file, stream=True)
+    elapsed: seconds spent on network (None if response did not come from network)
+    """
+
+    def __init__(self, status_code: int, headers: Dict, content: Optional[bytes] = None,
+                 body_file: Optional[BinaryIO] = None, elapsed: Optional[float] = None):
+        self.status_code = status_code
+        self.headers = headers
+        self._content = content
+        self.body_file = body_file
+        self.elapsed = elapsed
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None and self.body_file is not None:
+            self.body_file.seek(0)
+            self._content = self.body_file.read()
+        return self._content
+
+    @property
+    def size(self) -> int:
+        """Body size in bytes"""
+        if self._content is not None:
+            return len(self._content)
+        return self.body_file.seek(0, io.SEEK_END) if self.body_file is not None else 0
+
+    def open(self) -> BinaryIO:
+        """Get body as file, positioned at start"""
+        if self.body_file is None:
+            return io.BytesIO(self._content)
+        self.body_file.seek(0)
+        return self.body_file
+
+    def json(self) -> Dict:
+        return json.loads(self.content)
+
+    def close(self):
+        if self.body_file is not None:
+            self.body_file.close()
+
+
+class RequestsTransport:
+    """Blocking backend: requests.Session with a bounded connection pool"""
+
+    name = "requests"
+
+    def __init__(self, headers: Dict, limiter: Optional[RateLimiter] = None, pool_size: int = 4,
+                 timeout: float = 30):
+        # Imported here (like httpx for the async backend), so importing this module stays cheap
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.limiter = limiter or RateLimiter()
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max(pool_size, self.limiter.concurrency),
+                                           thread_name_prefix="transport")
+
+    def post(self, url: str, payload: Dict, stream: bool = False) -> TransportResponse:
+        """Send request, respecting rate limits"""
+        self.limiter.acquire()
+        try:
+            started = time.monotonic()
+            response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+            if not stream:
+                return TransportResponse(response.status_code, response.headers, response.content,
+                                         elapsed=time.monotonic() - started)
+
+            body_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            with response:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    body_file.write(chunk)
+            return TransportResponse(response.status_code, response.headers, body_file=body_file,
+                                     elapsed=time.monotonic() - started)
+        finally:
+            self.limiter.release()
+
+    def submit(self, url: str, payload: Dict, stream: bool = False) -> Future:
+        """Send request in background, returns Future[TransportResponse]"""
+        return self.executor.submit(self.post, url, payload, stream)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+class AsyncTransport:
+    """
+    asyncio backend: httpx.AsyncClient (HTTP/2 when "h2" is installed)
+    running in its own event loop thread, so blocking callers can share it
+    """
+
+    name = "async"
+
+    def __init__(self, headers: Dict, limiter: Optional[RateLimiter] = None, pool_size: int = 4,
+                 timeout: float = 30):
+        import asyncio
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("Async backend requires httpx: pip install 'httpx[http2]'")
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+
+        self.asyncio = asyncio
+        self.limiter = limiter or RateLimiter()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="transport-loop", daemon=True)
+        self.thread.start()
+
+        async def setup():
+            client = httpx.AsyncClient(
+                headers=headers,
+                http2=http2,
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            )
+            return client, asyncio.Semaphore(self.limiter.concurrency)
+
+        self.client, self.slots = asyncio.run_coroutine_threadsafe(setup(), self.loop).result()
+
+    async def post_async(self, url: str, payload: Dict, stream: bool = False) -> TransportResponse:
+        """Send request from inside the event loop, respecting rate limits"""
+        async with self.slots:
+            wait = self.limiter.reserve()
+            if wait > 0:
+                await self.asyncio.sleep(wait)
+            request = self.client.build_request("POST", url, content=json.dumps(payload),
+                                                headers={"Content-Type": "application/json;charset=UTF-8"})
+            started = time.monotonic()
+            if not stream:
+                response = await self.client.send(request)
+                return TransportResponse(response.status_code, response.headers, response.content,
+                                         elapsed=time.monotonic() - started)
+
+            body_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            response = await self.client.send(request, stream=True)
+            try:
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    body_file.write(chunk)
+            finally:
+                await response.aclose()
+            return TransportResponse(response.status_code, response.headers, body_file=body_file,
+                                     elapsed=time.monotonic() - started)
+
+    def submit(self, url: str, payload: Dict, stream: bool = False) -> Future:
+        """Send request in background, returns Future[TransportResponse]"""
+        return self.asyncio.run_coroutine_threadsafe(self.post_async(url, payload, stream), self.loop)
+
+    def post(self, url: str, payload: Dict, stream: bool = False) -> TransportResponse:
+        return self.submit(url, payload, stream).result()
+
+    def close(self):
+        self.asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+BACKENDS = {
+    RequestsTransport.name: RequestsTransport,
+    AsyncTransport.name: AsyncTransport,
+}
+
+
+def create_transport(backend: str, headers: Dict, limiter: Optional[RateLimiter] = None, pool_size: int = 4,
+                     timeout: float = 30):
+    """Create transport by backend name"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (available: {', '.join(BACKENDS)})")
+    return BACKENDS[backend](headers, limiter=limiter, pool_size=pool_size, timeout=timeout)
@@ -0,0 +1,61 @@
+import threading
+from typing import Optional
+
+
+class PageWindow:
+    """
+    Page size (Window.Count) of querydata requests, shared by all chains of a run
+    Fixed unless latency_budget or size_budget is set, then adaptive:
+    - full pages under budget grow the window (at most x2 per page, up to max_count)
+    - pages over budget shrink it in proportion
+    - short pages that still have a restart token mean the server capped the window
+    - errors and timeouts halve it and lower max_count
+    """
+
+    def __init__(self, count: int = 500, min_count: int = 100, max_count: int = 30000,
+                 latency_budget: Optional[float] = None, size_budget: Optional[int] = None):
+        self.count = count
+        self.min_count = min(min_count, count)
+        self.max_count = max(max_count, count)
+        self.latency_budget = latency_budget
+        self.size_budget = size_budget
+        self.lock = threading.Lock()
+
+    @property
+    def adaptive(self) -> bool:
+        return bool(self.latency_budget or self.size_budget)
+
+    def record(self, requested: int, rows: int, has_more: bool, elapsed: Optional[float], size: int):
+        """Adjust window after successful page (elapsed is None for cached responses)"""
+        if not self.adaptive or elapsed is None:
+            return
+        with self.lock:
+            if has_more and 0 < rows < requested:
+                # Server truncated the page, larger windows won't help
+                self.max_count = max(self.min_count, rows)
+                self.count = min(self.count, self.max_count)
+                return
+
+            # Keep 20% headroom below the budget
+            ratio = 2.0
+            if self.latency_budget and elapsed > 0:
+                ratio = min(ratio, 0.8 * self.latency_budget / elapsed)
+            if self.size_budget and size > 0:
+                ratio = min(ratio, 0.8 * self.size_budget / size)
+
+            if ratio < 1 or rows >= requested:
+                count = int(requested * ratio)
+                self.count = max(self.min_count, min(self.max_count, count))
+
+    def fail(self, requested: int) -> bool:
+        """
+        Halve window after error or timeout, False if it can't get any smaller
+        Halved size also becomes max_count, so window doesn't grow back into errors
+        """
+        if not self.adaptive:
+            return False
+        with self.lock:
+            if requested <= self.min_count:
+                return False
+            self.count = self.max_count = max(self.min_count, min(self.count, requested // 2))
+            return True